@@ -0,0 +1,141 @@
+import time
+# how long getting to the first solver takes, see main
+_start = time.perf_counter()
+
+import importlib
+import json
+import logging
+import os
+from contextlib import nullcontext
+
+_logger = logging.getLogger(__name__)
+
+# problem --> (solver module, default input next to it). Solvers are only
+# imported when their problem is run so startup stays cheap.
+PROBLEMS = {
+    1: ("prob1.go", "caldoc.txt"),
+    2: ("prob2.go", "games.txt"),
+    3: ("prob3.go", "schematic.txt"),
+    4: ("prob4.go", "scratchers.txt"),
+    5: ("prob5.go", "almanac.txt"),
+}
+
+def get_default_input(problem):
+    module_name, input_name = PROBLEMS[problem]
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), module_name.split(".")[0], input_name)
+
+def parse_problems(raw_problems):
+    # "1 3 5", "1..5", "2..3 5" or "all"
+    problems = []
+    for raw_problem in raw_problems:
+        if raw_problem == "all":
+            problems.extend(PROBLEMS)
+        elif ".." in raw_problem:
+            first, last = raw_problem.split("..")
+            problems.extend(range(int(first), int(last) + 1))
+        else:
+            problems.append(int(raw_problem))
+    for problem in problems:
+        if problem not in PROBLEMS:
+            raise RuntimeError(f"no problem {problem}, expected one of {list(PROBLEMS)}")
+    return problems
+
+def parse_inputs(raw_inputs, problems):
+    # --input PATH for a single problem, otherwise --input N=PATH
+    inputs = {}
+    for raw_input in raw_inputs:
+        problem, sep, path = raw_input.partition("=")
+        if sep and problem.isdigit():
+            inputs[int(problem)] = path
+        elif len(problems) == 1:
+            inputs[problems[0]] = raw_input
+        else:
+            raise RuntimeError(f"--input {raw_input} needs to say which problem it's for, like 1={raw_input}")
+    return inputs
+
+def run_problem(problem, input, profile=None):
+    module_name, _ = PROBLEMS[problem]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with profile or nullcontext():
+        module.solve(input)
+    solve_elapsed = time.perf_counter() - start
+    return import_elapsed, solve_elapsed
+
+def get_profile(problem, args):
+    # None unless one of the profiling options was given
+    if not (args.profile or args.profile_memory or args.cprofile):
+        return None
+    from instrument import Profile
+    cprofile_path = None
+    if args.cprofile:
+        os.makedirs(args.cprofile, exist_ok=True)
+        cprofile_path = os.path.join(args.cprofile, f"prob{problem}.prof")
+    return Profile(f"prob{problem}", trace_memory=args.profile_memory, cprofile_path=cprofile_path)
+
+def print_profile(profile):
+    for phase in profile.phases:
+        memory = "" if phase["peak_memory"] is None else f", peak {phase['peak_memory'] / (1 << 20):.1f}MB"
+        print(f"   {phase['name']:>28}: {phase['seconds']:8.3f}s{memory}")
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="advent")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run one or more problems in this process")
+    run_parser.add_argument('problems', nargs='+', help="problem numbers, ranges like 1..5, or all")
+    run_parser.add_argument('--input', action='append', default=[], help="input file, or N=PATH when running more than one problem")
+    run_parser.add_argument('--profile', metavar='REPORT', help="time each solver phase and write a JSON report here")
+    run_parser.add_argument('--profile-memory', action='store_true', help="also track peak memory per phase with tracemalloc (slow)")
+    run_parser.add_argument('--cprofile', metavar='DIR', help="write a cProfile .prof file per problem to this directory")
+    run_parser.add_argument('--trace', action='store_true', help="log every line, pull, component and seed the solvers look at")
+    run_parser.add_argument('--trace-sample', type=int, metavar='N', help="trace only 1 in N of those events")
+    run_parser.add_argument('--cache', metavar='DIR', help="keep parsed inputs here and reuse them when an input hasn't changed")
+    run_parser.add_argument('--cache-size-mb', type=int, default=1024, help="least recently used parsed inputs are dropped past this")
+    run_parser.add_argument('--verbose', '-v', action='count', default=0)
+    args = parser.parse_args(argv)
+
+    verbosity = 2 - args.verbose
+    logging_level = {
+        0: logging.DEBUG,
+        1: logging.INFO,
+        2: logging.WARNING,
+        3: logging.ERROR,
+        4: logging.CRITICAL,
+    }[verbosity]
+    log_format = "[%(relativeCreated)6d] %(levelname)-5s %(funcName)s: %(message)s"
+    logging.basicConfig(level=logging_level, format=log_format)
+
+    if args.trace or args.trace_sample:
+        from instrument import set_tracing
+        set_tracing(True, args.trace_sample or 1)
+
+    if args.cache:
+        from parse_cache import set_cache
+        set_cache(args.cache, args.cache_size_mb << 20)
+
+    problems = parse_problems(args.problems)
+    inputs = parse_inputs(args.input, problems)
+
+    print(f"startup: {(time.perf_counter() - _start) * 1000:.1f}ms")
+    reports = []
+    for problem in problems:
+        input = inputs.get(problem, get_default_input(problem))
+        print(f"== Problem {problem}: {input}")
+        profile = get_profile(problem, args)
+        import_elapsed, solve_elapsed = run_problem(problem, input, profile)
+        print(f"== Problem {problem}: {solve_elapsed:.3f}s (import {import_elapsed * 1000:.1f}ms)")
+        if profile is not None:
+            print_profile(profile)
+            reports.append(dict(profile.report(), input=input, import_seconds=import_elapsed))
+
+    if args.profile:
+        with open(args.profile, 'w') as f:
+            json.dump({"problems": reports}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import logging
+import random
+
+_logger = logging.getLogger(__name__)
+
+# Each generator writes lines to an open file until it has written about
+# `size` bytes, using only `rng` for randomness so a seed always gives the
+# same file. Lines are written in batches so nothing bigger than a batch is
+# ever held in memory.
+_BATCH_LINES = 10000
+
+NUMBERS = ["one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+SYMBOLS = "!@#$%^&*/+=-"
+
+
+def _write_lines(f, size, get_line):
+    written = 0
+    idx = 0
+    while written < size:
+        lines = []
+        for _ in range(_BATCH_LINES):
+            lines.append(get_line(idx))
+            idx += 1
+            written += len(lines[-1]) + 1
+            if written >= size:
+                break
+        f.write("\n".join(lines) + "\n")
+    return idx
+
+
+def write_caldoc(f, size, rng):
+    # letters with spelled out and plain digits mixed in; every line has at
+    # least one plain digit so the digit only engines work on it too
+    def get_line(idx):
+        parts = []
+        for _ in range(rng.randint(2, 6)):
+            choice = rng.random()
+            if choice < 0.3:
+                parts.append(rng.choice(NUMBERS))
+            elif choice < 0.5:
+                parts.append(str(rng.randint(1, 9)))
+            else:
+                parts.append("".join(rng.choice(LETTERS) for _ in range(rng.randint(1, 6))))
+        parts.insert(rng.randrange(len(parts) + 1), str(rng.randint(1, 9)))
+        return "".join(parts)
+    return _write_lines(f, size, get_line)
+
+
+def write_games(f, size, rng):
+    # Game 1: 3 blue, 4 red; 1 red, 2 green, 6 blue; 2 green
+    def get_line(idx):
+        pulls = []
+        for _ in range(rng.randint(1, 6)):
+            colors = rng.sample(["red", "green", "blue"], rng.randint(1, 3))
+            pulls.append(", ".join(f"{rng.randint(1, 20)} {color}" for color in colors))
+        return f"Game {idx + 1}: {'; '.join(pulls)}"
+    return _write_lines(f, size, get_line)
+
+
+def write_schematic(f, size, rng, width=140):
+    # fixed width rows of numbers and symbols on a field of dots
+    def get_line(idx):
+        row = []
+        while len(row) < width:
+            choice = rng.random()
+            if choice < 0.1:
+                row.extend(str(rng.randint(1, 999)))
+            elif choice < 0.14:
+                # lots of * so there are gears to find
+                row.append("*" if rng.random() < 0.5 else rng.choice(SYMBOLS))
+            else:
+                row.append(".")
+            row.append(".")
+        return "".join(row[:width - 1]) + "."
+    return _write_lines(f, size, get_line)
+
+
+def write_scratchers(f, size, rng, num_winning=10, num_mine=25):
+    # Card        1: 58  6 71 93 96 38 25 29 17  8 | 79 33 93 58 53 96 ...
+    # Only one card in five wins anything (half a match per card on average),
+    # so the cascade of won copies dies out instead of growing exponentially
+    # with the deck.
+    def get_line(idx):
+        num_matches = rng.randint(1, 4) if rng.random() < 0.2 else 0
+        numbers = rng.sample(range(1, 100), num_winning + num_mine - num_matches)
+        winning_numbers = numbers[:num_winning]
+        my_numbers = numbers[num_winning:] + rng.sample(winning_numbers, num_matches)
+        rng.shuffle(my_numbers)
+        winning = " ".join(f"{number:2d}" for number in winning_numbers)
+        mine = " ".join(f"{number:2d}" for number in my_numbers)
+        return f"Card {idx + 1:8d}: {winning} | {mine}"
+    return _write_lines(f, size, get_line)
+
+
+MAP_LABELS = [
+    'seed-to-soil',
+    'soil-to-fertilizer',
+    'fertilizer-to-water',
+    'water-to-light',
+    'light-to-temperature',
+    'temperature-to-humidity',
+    'humidity-to-location',
+]
+
+
+def write_almanac(f, size, rng, num_seed_ranges=10, seeds_per_range=100000, max_value=1 << 32):
+    # Every map is one to one: [0, max_value) is cut into blocks and the
+    # blocks are shuffled. Blocks are only shuffled within batches of
+    # neighbours, each batch laid back over its own span, so no more than a
+    # batch of them is held at once. Size only grows the maps; the seed ranges
+    # stay small enough for the brute force modes to be timed.
+    # A map line is a dest and src about as long as max_value and a length
+    # about as long as an average block, which depends on how many blocks
+    # there are, so guess twice. Every block needs at least one value and
+    # every batch room to be cut up, hence max_value // 2.
+    num_ranges = 1
+    for _ in range(2):
+        map_line_size = 2 * len(str(max_value)) + len(str(max_value // num_ranges)) + 3
+        num_ranges = max(1, min(size // (map_line_size * len(MAP_LABELS)), max_value // 2))
+
+    seeds = []
+    for _ in range(num_seed_ranges):
+        seeds.extend([rng.randrange(max_value - seeds_per_range), rng.randint(1, seeds_per_range)])
+    f.write(f"seeds: {' '.join(str(seed) for seed in seeds)}\n")
+
+    for label in MAP_LABELS:
+        f.write(f"\n{label} map:\n")
+        for batch_start in range(0, num_ranges, _BATCH_LINES):
+            batch_stop = min(batch_start + _BATCH_LINES, num_ranges)
+            span_start = max_value * batch_start // num_ranges
+            span_stop = max_value * batch_stop // num_ranges
+            cuts = sorted(rng.sample(range(span_start + 1, span_stop), batch_stop - batch_start - 1))
+            starts = [span_start] + cuts
+            stops = cuts + [span_stop]
+            dest_order = list(range(len(starts)))
+            rng.shuffle(dest_order)
+
+            # lay the shuffled blocks end to end to get their dest starts
+            dest_starts = [0] * len(starts)
+            dest_start = span_start
+            for block_idx in dest_order:
+                dest_starts[block_idx] = dest_start
+                dest_start += stops[block_idx] - starts[block_idx]
+
+            f.write("".join(f"{dest_starts[i]} {starts[i]} {stops[i] - starts[i]}\n" for i in range(len(starts))))
+    return num_ranges
+
+
+GENERATORS = {
+    "caldoc": write_caldoc,
+    "games": write_games,
+    "schematic": write_schematic,
+    "scratchers": write_scratchers,
+    "almanac": write_almanac,
+}
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+
+
+def parse_size(raw_size):
+    # "4096", "10KB", "1.5MB", "2GB"
+    raw_size = raw_size.strip().upper()
+    number = raw_size.rstrip("KMGB")
+    return int(float(number) * _SIZE_UNITS[raw_size[len(number):]])
+
+
+def generate(kind, path, size, seed=0, **options):
+    # options go to the generator, like width for a schematic
+    with open(path, 'w') as f:
+        count = GENERATORS[kind](f, size, random.Random(seed), **options)
+    _logger.info(f"wrote {kind} to {path}: {count} items")
+    return path
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('kind', choices=GENERATORS.keys())
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--size', type=parse_size, default="10KB", help="roughly how big, like 10KB, 5MB or 1GB")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--width', type=int, help="schematic row width")
+    args = parser.parse_args()
+
+    options = {}
+    if args.width:
+        if args.kind != "schematic":
+            parser.error("--width only applies to schematics")
+        options["width"] = args.width
+    generate(args.kind, args.output, args.size, args.seed, **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from bench.generators import generate, parse_size
+
+_logger = logging.getLogger(__name__)
+
+# Every solver mode, as (problem, mode, input kind, function of the input path
+# returning the answer). Solvers are imported inside the functions so only
+# the problems being run get imported.
+
+def _prob1_mode(engine, workers=1):
+    def run(input):
+        from prob1.go import sum_cal_values
+        return sum_cal_values(input, engine, workers)
+    return run
+
+def _prob2_objects(input):
+    from prob2.go import get_all_game_infos, get_game_power, is_game_possible
+    all_game_infos = get_all_game_infos(input)
+    possible_id_sum = sum(game_info.id for game_info in all_game_infos if is_game_possible(game_info, 12, 13, 14))
+    return possible_id_sum, sum(get_game_power(game_info) for game_info in all_game_infos)
+
+def _prob2_table(input):
+    from prob2.go import get_game_powers, get_game_table, get_possible_games
+    game_table = get_game_table(input)
+    return sum(get_possible_games(game_table, 12, 13, 14)), sum(get_game_powers(game_table))
+
+def _prob2_index(input):
+    from prob2.go import GameLimitIndex, get_game_powers, get_game_table
+    game_table = get_game_table(input)
+    return GameLimitIndex(game_table).query(12, 13, 14)[0], sum(get_game_powers(game_table))
+
+def _prob2_stream(input):
+    from prob2.go import get_game_totals
+    with open(input) as f:
+        return get_game_totals(f, 12, 13, 14)
+
+def _prob3_comps(input):
+    from prob3.go import get_schematic
+    schematic = get_schematic(input)
+    return sum(schematic.get_part_numbers()), sum(schematic.get_gear_ratios())
+
+def _prob3_stream(input):
+    from prob3.go import get_schematic_totals
+    with open(input) as f:
+        return get_schematic_totals(f)
+
+def _prob3_mask(input):
+    from prob3.go import get_grid, get_masked_gear_ratios, get_masked_part_numbers, get_symbol_masks
+    grid = get_grid(input)
+    return sum(get_masked_part_numbers(grid, get_symbol_masks(grid))), sum(get_masked_gear_ratios(grid))
+
+def _prob3_parallel(workers):
+    def run(input):
+        from prob3.go import get_schematic_totals_parallel
+        return get_schematic_totals_parallel(input, workers)
+    return run
+
+def _prob4_scratchers(input):
+    from prob4.go import get_scratchers, play_scratchers
+    scratchers = get_scratchers(input)
+    return sum(scratcher.get_points() for scratcher in scratchers), play_scratchers(scratchers)[0]
+
+def _prob4_columns(input):
+    from prob4.go import get_points_for_matches, get_scratcher_match_counts, play_match_counts
+    match_counts = get_scratcher_match_counts(input)
+    return sum(map(get_points_for_matches, match_counts)), play_match_counts(match_counts)[0]
+
+def _prob4_stream(input):
+    from prob4.go import get_scratcher_totals
+    with open(input) as f:
+        return get_scratcher_totals(f)
+
+def _prob5_mode(method_name):
+    def run(input):
+        from prob5.go import get_almanac
+        return getattr(get_almanac(input), method_name)()
+    return run
+
+MODES = [
+    (1, "all-digits", "caldoc", _prob1_mode("all-digits")),
+    (1, "automaton", "caldoc", _prob1_mode("automaton")),
+    (1, "automaton-workers-4", "caldoc", _prob1_mode("automaton", 4)),
+    (1, "naive", "caldoc", _prob1_mode("naive")),
+    (1, "naive-bulk", "caldoc", _prob1_mode("naive-bulk")),
+    (2, "objects", "games", _prob2_objects),
+    (2, "table", "games", _prob2_table),
+    (2, "limit-index", "games", _prob2_index),
+    (2, "stream", "games", _prob2_stream),
+    (3, "comps", "schematic", _prob3_comps),
+    (3, "stream", "schematic", _prob3_stream),
+    (3, "mask", "schematic", _prob3_mask),
+    (3, "workers-4", "schematic", _prob3_parallel(4)),
+    (4, "scratchers", "scratchers", _prob4_scratchers),
+    (4, "columns", "scratchers", _prob4_columns),
+    (4, "stream", "scratchers", _prob4_stream),
+    (5, "brute", "almanac", _prob5_mode("get_lowest_location_brute")),
+    (5, "brute2", "almanac", _prob5_mode("get_lowest_location_brute2")),
+    (5, "fast", "almanac", _prob5_mode("get_lowest_location_fast")),
+    (5, "forward", "almanac", _prob5_mode("get_lowest_location_forward")),
+]
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes, seed, work_dir, problems=None, modes=None, repeat=1, kind_options=None):
+    # Inputs are generated once per (kind, size) and shared by every mode
+    # that reads that kind. Each mode keeps its best time of `repeat` runs.
+    # kind_options are passed on to the generator, like {"schematic":
+    # {"width": 10000}}.
+    kind_options = kind_options or {}
+    results = []
+    inputs = {}
+    for size in sizes:
+        for problem, mode, kind, run in MODES:
+            if problems and problem not in problems:
+                continue
+            if modes and mode not in modes and f"{problem}:{mode}" not in modes:
+                continue
+
+            if (kind, size) not in inputs:
+                options = kind_options.get(kind, {})
+                option_names = "".join(f"-{name}{value}" for name, value in sorted(options.items()))
+                path = os.path.join(work_dir, f"{kind}-{size}-{seed}{option_names}.txt")
+                start = time.perf_counter()
+                inputs[(kind, size)] = generate(kind, path, size, seed, **options)
+                _logger.info(f"generated {path} in {time.perf_counter() - start:.3f}s")
+            input = inputs[(kind, size)]
+
+            elapsed = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                answer = run(input)
+                run_elapsed = time.perf_counter() - start
+                elapsed = run_elapsed if elapsed is None else min(elapsed, run_elapsed)
+
+            result = {
+                "problem": problem,
+                "mode": mode,
+                "size": size,
+                "bytes": os.path.getsize(input),
+                "seconds": elapsed,
+                "answer": str(answer),
+            }
+            print(f"prob{problem} {mode:>20} {size:>12,} bytes: {elapsed:8.3f}s  {answer}")
+            results.append(result)
+    return results
+
+def compare_results(old_results, new_results):
+    old_by_key = {(r["problem"], r["mode"], r["size"]): r for r in old_results["results"]}
+    print(f"{old_results['commit']} --> {new_results['commit']}")
+    for result in new_results["results"]:
+        old = old_by_key.get((result["problem"], result["mode"], result["size"]))
+        if old is None:
+            continue
+        speedup = old["seconds"] / result["seconds"] if result["seconds"] else float("inf")
+        note = "" if old["answer"] == result["answer"] else "  ANSWER CHANGED"
+        print(f"prob{result['problem']} {result['mode']:>20} {result['size']:>12,} bytes: {old['seconds']:8.3f}s --> {result['seconds']:8.3f}s ({speedup:.2f}x){note}")
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[parse_size("10KB"), parse_size("100KB")])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--problem', type=int, action='append', help="only run these problems")
+    parser.add_argument('--mode', action='append', help="only run these modes, like automaton or 3:mask")
+    parser.add_argument('--repeat', type=int, default=1, help="keep the best of this many runs")
+    parser.add_argument('--schematic-width', type=int, help="row width of generated schematics, 140 by default")
+    parser.add_argument('--work-dir', help="where to put generated inputs, kept afterwards")
+    parser.add_argument('--output', help="write results as JSON here")
+    parser.add_argument('--compare', help="JSON results from an earlier run to compare against")
+    parser.add_argument('--cache', metavar='DIR', help="reuse parsed inputs from this cache, so warm runs skip parsing")
+    parser.add_argument('--trace-sample', type=int, metavar='N', help="run with hot path tracing on, logging 1 in N events")
+    parser.add_argument('--verbose', '-v', action='count', default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="[%(relativeCreated)6d] %(levelname)-5s %(funcName)s: %(message)s")
+
+    if args.cache:
+        from parse_cache import set_cache
+        set_cache(args.cache)
+    if args.trace_sample:
+        from instrument import set_tracing
+        set_tracing(True, args.trace_sample)
+
+    kind_options = {}
+    if args.schematic_width:
+        kind_options["schematic"] = {"width": args.schematic_width}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.work_dir or tmp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        results = {
+            "commit": get_commit(),
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "trace_sample": args.trace_sample,
+            "cache": args.cache,
+            "schematic_width": args.schematic_width,
+            "results": run_benchmarks(args.sizes, args.seed, work_dir, args.problem, args.mode, args.repeat, kind_options),
+        }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
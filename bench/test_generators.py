@@ -0,0 +1,44 @@
+import pytest
+from bench.generators import GENERATORS, generate, parse_size
+
+@pytest.mark.parametrize("kind", GENERATORS)
+def test_same_seed_same_bytes(tmp_path, kind):
+    first = generate(kind, tmp_path / "first.txt", 20000, seed=3)
+    second = generate(kind, tmp_path / "second.txt", 20000, seed=3)
+    other = generate(kind, tmp_path / "other.txt", 20000, seed=4)
+    with open(first, 'rb') as f:
+        first_bytes = f.read()
+    with open(second, 'rb') as f:
+        assert f.read() == first_bytes
+    with open(other, 'rb') as f:
+        assert f.read() != first_bytes
+
+@pytest.mark.parametrize("kind", GENERATORS)
+@pytest.mark.parametrize("size", [20000, 300000])
+def test_roughly_size(tmp_path, kind, size):
+    path = generate(kind, tmp_path / "input.txt", size)
+    assert 0.9 * size <= path.stat().st_size <= 1.1 * size
+
+def test_almanac_maps_one_to_one(tmp_path):
+    # more ranges than one shuffled batch
+    path = generate("almanac", tmp_path / "almanac.txt", 3000000)
+    with open(path) as f:
+        sections = f.read().split("\n\n")[1:]
+    for section in sections:
+        lines = section.strip().splitlines()[1:]
+        maps = [tuple(map(int, line.split())) for line in lines]
+        srcs = sorted((src, length) for _, src, length in maps)
+        dests = sorted((dest, length) for dest, _, length in maps)
+        for ranges in (srcs, dests):
+            assert ranges[0][0] == 0
+            assert all(start + length == next_start for (start, length), (next_start, _) in zip(ranges, ranges[1:]))
+            assert ranges[-1][0] + ranges[-1][1] == 1 << 32
+
+def test_schematic_width(tmp_path):
+    path = generate("schematic", tmp_path / "schematic.txt", 50000, width=5000)
+    with open(path) as f:
+        assert {len(line.rstrip("\n")) for line in f} == {5000}
+
+@pytest.mark.parametrize("raw_size,expected", [("4096", 4096), ("10KB", 10240), ("1.5MB", 3 << 19), ("2gb", 2 << 30)])
+def test_parse_size(raw_size, expected):
+    assert parse_size(raw_size) == expected
@@ -0,0 +1,147 @@
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+
+_logger = logging.getLogger(__name__)
+
+# The Profile being recorded, if any. Solvers mark their phases with phase(),
+# which is a shared do-nothing context manager unless a Profile is active, so
+# leaving the marks in costs one call and a global lookup per phase.
+_active_profile = None
+_NO_PHASE = nullcontext()
+
+
+class Profile:
+    # Records how long each phase() inside it takes and, optionally, the peak
+    # memory tracemalloc saw during each phase and a cProfile of the whole
+    # thing. Use as a context manager around one problem's run.
+    def __init__(self, label, trace_memory=False, cprofile_path=None):
+        self.label = label
+        self.trace_memory = trace_memory
+        self.cprofile_path = cprofile_path
+        self.phases = []
+        self.seconds = None
+        self.peak_memory = None
+        self._profiler = None
+        self._start = None
+
+    def __enter__(self):
+        global _active_profile
+        if _active_profile is not None:
+            raise RuntimeError(f"can't profile {self.label} inside {_active_profile.label}")
+        _active_profile = self
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.cprofile_path:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_profile
+        self.seconds = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.cprofile_path)
+        if self.trace_memory:
+            import tracemalloc
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        _active_profile = None
+        return False
+
+    def add_phase(self, name, seconds, peak_memory):
+        _logger.info(f"{self.label} {name}: {seconds:.3f}s")
+        self.phases.append({"name": name, "seconds": seconds, "peak_memory": peak_memory})
+
+    def report(self):
+        return {
+            "label": self.label,
+            "seconds": self.seconds,
+            "peak_memory": self.peak_memory,
+            "cprofile": self.cprofile_path,
+            "phases": self.phases,
+        }
+
+
+@contextmanager
+def _record_phase(profile, name):
+    peak_memory = None
+    if profile.trace_memory:
+        import tracemalloc
+        # peak for just this phase, not since tracing started
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if profile.trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        profile.add_phase(name, seconds, peak_memory)
+
+
+def phase(name):
+    if _active_profile is None:
+        return _NO_PHASE
+    return _record_phase(_active_profile, name)
+
+
+class Tracer:
+    # Hot path tracing. Call sites check `enabled` before doing anything else,
+    #
+    #     if _trace.enabled:
+    #         _trace("seed %s --> location %s", seed, location)
+    #
+    # so while tracing is off a trace point costs a global and an attribute
+    # lookup, and the arguments aren't even built. Messages are %-formatted by
+    # logging only when emitted, and with sample_every=N only every Nth event
+    # is emitted.
+    __slots__ = ("logger", "enabled", "sample_every", "_countdown")
+
+    def __init__(self, name, enabled=False, sample_every=1):
+        # its own logger so turning tracing on doesn't turn on the module's
+        # other debug logging too
+        self.logger = logging.getLogger(f"{name}.trace")
+        self.configure(enabled, sample_every)
+
+    def configure(self, enabled, sample_every=1):
+        if sample_every < 1:
+            raise RuntimeError(f"can't sample 1 in {sample_every} events")
+        self.enabled = enabled
+        self.sample_every = sample_every
+        # so the first event is always emitted
+        self._countdown = 1
+        if enabled:
+            self.logger.setLevel(logging.DEBUG)
+
+    def __call__(self, msg, *args):
+        self._countdown -= 1
+        if self._countdown:
+            return
+        self._countdown = self.sample_every
+        # stacklevel so records carry the trace point's function, not __call__
+        self.logger.debug(msg, *args, stacklevel=2)
+
+
+# name --> Tracer, and the settings new tracers start with, since solvers
+# usually get imported after tracing is set up
+_tracers = {}
+_tracing = (False, 1)
+
+
+def get_tracer(name):
+    if name not in _tracers:
+        _tracers[name] = Tracer(name, *_tracing)
+    return _tracers[name]
+
+
+def set_tracing(enabled, sample_every=1):
+    global _tracing
+    _tracing = (enabled, sample_every)
+    for tracer in _tracers.values():
+        tracer.configure(enabled, sample_every)
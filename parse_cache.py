@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+from array import array, typecodes as array_typecodes
+
+_logger = logging.getLogger(__name__)
+
+# A cache file holds one parsed input as a list of typed columns (anything
+# array() can hold):
+#
+#   magic, column count
+#   per column: typecode, item size, item count
+#   each column's items, starting on an 8 byte boundary
+#
+# Loading maps the file and hands back a memoryview cast to each column's
+# type, so nothing is read until it's looked at. Files are named after the
+# kind of thing parsed, the parser version and a hash of the input's
+# contents, so an edited input or a changed parser never gets a stale entry.
+_MAGIC = b"ADVCACHE"
+_HEADER = struct.Struct("<8sQ")
+_COLUMN = struct.Struct("<cB6xQ")
+_ALIGN = 8
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def _get_padding(offset):
+    return -offset % _ALIGN
+
+
+def get_content_hash(input):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(input, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_columns(f, columns):
+    f.write(_HEADER.pack(_MAGIC, len(columns)))
+    for column in columns:
+        f.write(_COLUMN.pack(column.typecode.encode(), column.itemsize, len(column)))
+    offset = _HEADER.size + _COLUMN.size * len(columns)
+    for column in columns:
+        padding = _get_padding(offset)
+        f.write(bytes(padding))
+        f.write(column)
+        offset += padding + len(column) * column.itemsize
+
+
+def read_columns(data):
+    # data is anything supporting the buffer protocol, usually an mmap.
+    # Returns None if it isn't a complete cache file.
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+        return None
+    magic, num_columns = _HEADER.unpack_from(data)
+    if magic != _MAGIC or _HEADER.size + _COLUMN.size * num_columns > len(data):
+        return None
+
+    offset = _HEADER.size + _COLUMN.size * num_columns
+    columns = []
+    for idx in range(num_columns):
+        typecode, itemsize, count = _COLUMN.unpack_from(data, _HEADER.size + _COLUMN.size * idx)
+        typecode = typecode.decode('latin-1')
+        # not a type at all, or from a build where this type is a different size
+        if typecode not in array_typecodes or array(typecode).itemsize != itemsize:
+            return None
+        offset += _get_padding(offset)
+        stop = offset + itemsize * count
+        if stop > len(data):
+            return None
+        columns.append(data[offset:stop].cast(typecode))
+        offset = stop
+    return columns
+
+
+class ParseCache:
+    # Parsed inputs on disk, least recently used ones deleted once there's
+    # more than max_bytes of them. Using an entry bumps its mtime, which is
+    # what "recently" goes by.
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, input, kind, version):
+        return os.path.join(self.directory, f"{kind}-v{version}-{get_content_hash(input)}.bin")
+
+    def load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                # the map stays open as long as any column is still around
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError is an empty file, which can't be mapped
+            return None
+        columns = read_columns(data)
+        if columns is None:
+            _logger.warning(f"ignoring corrupt cache file {path}")
+            return None
+        os.utime(path)
+        _logger.info(f"loaded {path}")
+        return columns
+
+    def store(self, path, columns):
+        size = sum(len(column) * column.itemsize for column in columns)
+        if size > self.max_bytes:
+            _logger.info(f"not caching {path}, {size} bytes is more than the {self.max_bytes} byte cap")
+            return
+        # written under another name first so a reader never sees half a file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            write_columns(f, columns)
+        os.replace(tmp_path, path)
+        _logger.info(f"stored {path}")
+        self.evict()
+
+    def get_entries(self):
+        # (mtime, size, path) of each cache file, least recently used first
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.get_entries()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            _logger.info(f"evicting {path}")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # another process got to it first
+                pass
+            total_size -= size
+
+
+# the cache solvers use, if any, set up by set_cache
+_cache = None
+
+
+def set_cache(directory, max_bytes=DEFAULT_MAX_BYTES):
+    global _cache
+    _cache = ParseCache(directory, max_bytes) if directory else None
+
+
+def cached_parse(input, kind, version, parse, dump, load):
+    # parse(input) makes the parsed object, dump(parsed) turns it into a list
+    # of arrays and load(columns) turns those back into an equivalent object.
+    # Without a cache, or for stdin and other non-files, just parses.
+    if _cache is None or not os.path.isfile(input):
+        return parse(input)
+    path = _cache.get_path(input, kind, version)
+    columns = _cache.load(path)
+    if columns is not None:
+        return load(columns)
+    parsed = parse(input)
+    # None is a parser saying it can't, nothing worth keeping
+    if parsed is not None:
+        _cache.store(path, dump(parsed))
+    return parsed
@@ -1 +0,0 @@
-_
\ No newline at end of file
@@ -0,0 +1,39 @@
+import logging
+import os
+import tempfile
+import time
+from prob1.go import BULK_CAL_VALUE_ENGINES, CAL_VALUE_ENGINES, get_cal_values
+
+_logger = logging.getLogger(__name__)
+
+def time_engine(engine, cal_doc):
+    start = time.perf_counter()
+    total = sum(get_cal_values(cal_doc, engine))
+    elapsed = time.perf_counter() - start
+    return total, elapsed
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cal-doc', required=True)
+    parser.add_argument('--repeat', type=int, default=100, help="times to tile the doc")
+    parser.add_argument('--engine', action='append', choices=[*CAL_VALUE_ENGINES, *BULK_CAL_VALUE_ENGINES])
+    args = parser.parse_args()
+
+    with open(args.cal_doc) as f:
+        lines = [line.strip() for line in f]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tiled_doc = os.path.join(tmp_dir, "caldoc.txt")
+        with open(tiled_doc, 'w') as f:
+            for _ in range(args.repeat):
+                f.write("\n".join(lines) + "\n")
+        num_lines = len(lines) * args.repeat
+
+        for engine in args.engine or ["all-digits", "automaton"]:
+            total, elapsed = time_engine(engine, tiled_doc)
+            print(f"{engine:>12}: {num_lines} lines in {elapsed:.3f}s ({num_lines / elapsed:,.0f} lines/s), sum {total}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
 import logging
+import os
 import re
+import sys
+from array import array
+from collections import deque
+
+if not __package__:
+    # run as a script from inside prob1/, so the top level modules aren't on
+    # the path yet
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrument import get_tracer, phase, set_tracing
 
 _logger = logging.getLogger(__name__)
+_trace = get_tracer(__name__)
 
 def get_first_digit(line):
     digit_match = re.search(r'(\d)', line)
@@ -9,7 +20,8 @@ def get_first_digit(line):
         raise RuntimeError(f"failed to find a digit in {line}")
     digit_str = digit_match.group(1)
     digit = int(digit_str)
-    _logger.debug(f"digit: {digit_str}: {digit}")
+    if _trace.enabled:
+        _trace("digit: %s: %s", digit_str, digit)
     return digit
 
 
@@ -17,13 +29,13 @@ def get_cal_value_naive(line):
     # On each line, the calibration value can be found by combining the first
     # digit and the last digit (in that order) to form a single two-digit
     # number.
-    _logger.info(f"getting cal value for {line}")
     first_digit = get_first_digit(line)
     reversed_line = line[::-1]
     last_digit = get_first_digit(reversed_line)
 
     cal_value = first_digit * 10 + last_digit
-    _logger.info(f"cal value for {line}: {cal_value}")
+    if _trace.enabled:
+        _trace("cal value for %s: %s", line, cal_value)
     return cal_value
 
 
@@ -52,7 +64,8 @@ def get_all_digits(line):
                     all_digits.append(num_index+1)
                     # we can't skip ahead since "oneight" is valid
 
-    _logger.debug(f"all digits: {line}: {all_digits}")
+    if _trace.enabled:
+        _trace("all digits: %s: %s", line, all_digits)
     return all_digits
 
 
@@ -65,21 +78,215 @@ def get_cal_value(line):
     first_digit = all_digits[0]
     last_digit = all_digits[-1]
     cal_value = first_digit * 10 + last_digit
-    _logger.info(f"cal value for {line}: {cal_value}")
+    if _trace.enabled:
+        _trace("cal value for %s: %s", line, cal_value)
     return cal_value
 
 
-def get_cal_values(cal_doc):
-    _logger.info("summing cal values")
+class DigitScanner:
+    # Aho-Corasick automaton over a fixed set of words. The goto/fail links are
+    # folded into a full transition table when it's built, so scanning is one
+    # dict lookup per character. Matches are found at the position they end,
+    # which is also the first one to start as long as no word contains another
+    # (true for the digits and NUMBERS).
+    def __init__(self, words):
+        # words is a dict of str --> value
+        trie = [{}]
+        self.outputs = [None]
+        for word, value in words.items():
+            state = 0
+            for ch in word:
+                if ch not in trie[state]:
+                    trie.append({})
+                    self.outputs.append(None)
+                    trie[state][ch] = len(trie) - 1
+                state = trie[state][ch]
+            self.outputs[state] = value
+
+        # breadth first so a state's fail link (always shallower) is finished
+        # before the state itself is
+        fail = [0] * len(trie)
+        order = []
+        queue = deque(trie[0].values())
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for ch, child in trie[state].items():
+                fail_state = fail[state]
+                while fail_state and ch not in trie[fail_state]:
+                    fail_state = fail[fail_state]
+                fail[child] = trie[fail_state].get(ch, 0)
+                if self.outputs[child] is None:
+                    self.outputs[child] = self.outputs[fail[child]]
+                queue.append(child)
+
+        self.transitions = [None] * len(trie)
+        self.transitions[0] = dict(trie[0])
+        for state in order:
+            self.transitions[state] = {**self.transitions[fail[state]], **trie[state]}
+
+    def find_first(self, line):
+        state = 0
+        transitions = self.transitions
+        outputs = self.outputs
+        for ch in line:
+            state = transitions[state].get(ch, 0)
+            value = outputs[state]
+            if value is not None:
+                return value
+        return None
+
+
+DIGIT_WORDS = {str(digit): digit for digit in range(10)}
+DIGIT_WORDS.update({num_str: num_index+1 for num_index, num_str in enumerate(NUMBERS)})
+
+_forward_scanner = DigitScanner(DIGIT_WORDS)
+# the last digit is the first one found scanning the reversed line for the
+# reversed words
+_backward_scanner = DigitScanner({word[::-1]: value for word, value in DIGIT_WORDS.items()})
+
+
+def get_cal_value_automaton(line):
+    # Same result as get_cal_value, but only scans until the first digit from
+    # each end instead of collecting every digit in the line.
+    first_digit = _forward_scanner.find_first(line)
+    if first_digit is None:
+        raise RuntimeError(f"failed to find a digit in {line}")
+    last_digit = _backward_scanner.find_first(line[::-1])
+    cal_value = first_digit * 10 + last_digit
+    if _trace.enabled:
+        _trace("cal value for %s: %s", line, cal_value)
+    return cal_value
+
+
+CAL_VALUE_ENGINES = {
+    "naive": get_cal_value_naive,
+    "all-digits": get_cal_value,
+    "automaton": get_cal_value_automaton,
+}
+
+
+# every byte except the digits and newline
+_NON_DIGIT_BYTES = bytes(b for b in range(256) if not (b == ord('\n') or ord('0') <= b <= ord('9')))
+_BULK_CHUNK_SIZE = 1 << 24
+
+
+def _get_cal_values_from_digits(digit_lines, cal_values):
+    for digits in digit_lines:
+        if not digits:
+            raise RuntimeError(f"failed to find a digit in line {len(cal_values) + 1}")
+        cal_values.append(digits[0] * 10 + digits[-1] - 11 * ord('0'))
+
+
+def get_cal_values_bulk(cal_doc, start=0, stop=None):
+    # Same values as get_cal_value_naive, but instead of two regex searches
+    # per line the file is read in big chunks and every non-digit byte is
+    # dropped at once with bytes.translate. What's left of each line is just
+    # its digits, so the first and last byte are the value.
+    cal_values = array('B')
+    with open(cal_doc, 'rb') as f:
+        if stop is None:
+            stop = os.path.getsize(cal_doc)
+        f.seek(start)
+        pos = start
+        leftover = b''
+        # whether anything at all follows the last newline, digits or not
+        has_last_line = False
+        while pos < stop:
+            chunk = f.read(min(_BULK_CHUNK_SIZE, stop - pos))
+            if not chunk:
+                break
+            pos += len(chunk)
+            # (a chunk without a newline is all last line)
+            has_last_line = chunk.rfind(b'\n') < len(chunk) - 1
+            digits = leftover + chunk.translate(None, _NON_DIGIT_BYTES)
+            # the last line may continue into the next chunk
+            *digit_lines, leftover = digits.split(b'\n')
+            _get_cal_values_from_digits(digit_lines, cal_values)
+        if has_last_line:
+            # raises if the last line has no digits, like a line ending in \n would
+            _get_cal_values_from_digits([leftover], cal_values)
+    return cal_values
+
+
+# engines that work on the whole file (or a byte range of it) rather than
+# line by line
+BULK_CAL_VALUE_ENGINES = {
+    "naive-bulk": get_cal_values_bulk,
+}
+
+
+def get_cal_values(cal_doc, engine="automaton"):
+    _logger.info(f"summing cal values ({engine})")
+    if engine in BULK_CAL_VALUE_ENGINES:
+        return BULK_CAL_VALUE_ENGINES[engine](cal_doc)
+    get_value = CAL_VALUE_ENGINES[engine]
     with open(cal_doc) as f:
-        cal_values = [get_cal_value(line.strip()) for line in list(f)]
+        cal_values = [get_value(line.strip()) for line in list(f)]
     return cal_values
 
+
+def get_shards(cal_doc, num_shards):
+    # split the file into (start, stop) byte ranges that begin and end on line
+    # boundaries, so each shard can be read without looking at the others
+    size = os.path.getsize(cal_doc)
+    starts = [0]
+    with open(cal_doc, 'rb') as f:
+        for i in range(1, num_shards):
+            # back up one byte so a guess that lands right at the start of a
+            # line keeps that line
+            f.seek(max(0, size * i // num_shards - 1))
+            f.readline()
+            start = f.tell()
+            if start > starts[-1] and start < size:
+                starts.append(start)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def sum_cal_values_in_shard(cal_doc, start, stop, engine):
+    if engine in BULK_CAL_VALUE_ENGINES:
+        return sum(BULK_CAL_VALUE_ENGINES[engine](cal_doc, start, stop))
+
+    get_value = CAL_VALUE_ENGINES[engine]
+    total = 0
+    with open(cal_doc, 'rb') as f:
+        f.seek(start)
+        pos = start
+        while pos < stop:
+            line = f.readline()
+            pos += len(line)
+            total += get_value(line.decode().strip())
+    _logger.debug(f"shard [{start}, {stop}): {total}")
+    return total
+
+
+def sum_cal_values(cal_doc, engine="automaton", workers=1):
+    # Only partial sums come back from each shard, so no shard (or the parent)
+    # ever holds more than one line at a time.
+    if workers <= 1:
+        return sum_cal_values_in_shard(cal_doc, 0, os.path.getsize(cal_doc), engine)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    shards = get_shards(cal_doc, workers)
+    _logger.info(f"summing cal values ({engine}) in {len(shards)} shards")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(sum_cal_values_in_shard, cal_doc, start, stop, engine) for start, stop in shards]
+        return sum(future.result() for future in futures)
+
+
+def solve(cal_doc, engine="automaton", workers=1):
+    with phase("sum_cal_values"):
+        sum_val_values = sum_cal_values(cal_doc, engine, workers)
+    print(f"Sum of Calibration Values: {sum_val_values}")
+
 def main():
     import argparse
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--cal-doc', required=True)
+    parser.add_argument('--engine', choices=[*CAL_VALUE_ENGINES, *BULK_CAL_VALUE_ENGINES], default="automaton")
+    parser.add_argument('--workers', type=int, default=1)
     parser.add_argument('--verbose', '-v', action='count', default=0)
     args = parser.parse_args()
 
@@ -93,9 +300,11 @@ def main():
     }[verbosity]
     log_format = "[%(relativeCreated)6d] %(levelname)-5s %(funcName)s: %(message)s"
     logging.basicConfig(level=logging_level, format=log_format)
+    if logging_level == logging.DEBUG:
+        # -vv also traces every item the solver looks at
+        set_tracing(True)
 
-    sum_val_values = sum(get_cal_values(args.cal_doc))
-    print(f"Sum of Calibration Values: {sum_val_values}")
+    solve(args.cal_doc, args.engine, args.workers)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
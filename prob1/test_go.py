@@ -0,0 +1,50 @@
+import pytest
+from prob1.go import get_cal_value, get_cal_value_automaton, get_cal_value_naive, get_cal_values, get_shards, sum_cal_values
+
+@pytest.mark.parametrize(
+    "line",
+    ["two1nine",
+     "eightwothree",
+     "abcone2threexyz",
+     "xtwone3four",
+     "4nineeightseven2",
+     "zoneight234",
+     "7pqrstsixteen",
+     "oneight",
+     "sevenine",
+     "threeeightwo",
+     "ninine",
+     "5",
+])
+def test_automaton_matches_all_digits(line):
+    assert get_cal_value_automaton(line) == get_cal_value(line)
+
+def test_automaton_no_digits():
+    with pytest.raises(RuntimeError):
+        get_cal_value_automaton("abcdef")
+
+@pytest.mark.parametrize("num_shards", [1, 2, 3, 5, 50])
+def test_shards_cover_lines(tmp_path, num_shards):
+    cal_doc = tmp_path / "caldoc.txt"
+    cal_doc.write_text("two1nine\neightwothree\nabcone2threexyz\nxtwone3four\n4nineeightseven2\n")
+    shards = get_shards(cal_doc, num_shards)
+    assert shards[0][0] == 0
+    assert shards[-1][1] == cal_doc.stat().st_size
+    assert all(a[1] == b[0] for a, b in zip(shards, shards[1:]))
+    assert sum_cal_values(cal_doc, workers=num_shards) == 29 + 83 + 13 + 24 + 42
+
+def test_bulk_matches_naive(tmp_path):
+    cal_doc = tmp_path / "caldoc.txt"
+    lines = ["1abc2", "pqr3stu8vwx", "a1b2c3d4e5f", "treb7uchet", "x0y"]
+    cal_doc.write_text("\r\n".join(lines))
+    assert list(get_cal_values(cal_doc, "naive-bulk")) == [get_cal_value_naive(line) for line in lines]
+    assert sum_cal_values(cal_doc, "naive-bulk", workers=3) == sum(get_cal_value_naive(line) for line in lines)
+
+    # a last line without digits or a newline still has to fail
+    cal_doc.write_text("1abc\nxyz")
+    with pytest.raises(RuntimeError):
+        get_cal_value_naive("xyz")
+    with pytest.raises(RuntimeError):
+        get_cal_values(cal_doc, "naive-bulk")
+    with pytest.raises(RuntimeError):
+        sum_cal_values(cal_doc, "naive-bulk", workers=2)
@@ -0,0 +1,48 @@
+import logging
+import random
+import time
+from prob2.go import GameLimitIndex, get_game_table, get_possible_games
+
+_logger = logging.getLogger(__name__)
+
+def time_scan(game_table, limits):
+    start = time.perf_counter()
+    results = []
+    for limit in limits:
+        possible_games = get_possible_games(game_table, *limit)
+        results.append((sum(possible_games), len(possible_games)))
+    return results, time.perf_counter() - start
+
+def time_index(game_table, limits):
+    start = time.perf_counter()
+    index = GameLimitIndex(game_table)
+    build_elapsed = time.perf_counter() - start
+    results = index.query_many(limits)
+    return results, build_elapsed, time.perf_counter() - start - build_elapsed
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', required=True)
+    parser.add_argument('--repeat', type=int, default=100, help="times to tile the games")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    game_table = get_game_table(args.input)
+    game_table.ids *= args.repeat
+    game_table.max_red *= args.repeat
+    game_table.max_green *= args.repeat
+    game_table.max_blue *= args.repeat
+
+    rng = random.Random(args.seed)
+    print(f"{len(game_table)} games")
+    for num_queries in (10, 100, 1000, 10000):
+        limits = [(rng.randint(0, 20), rng.randint(0, 20), rng.randint(0, 20)) for _ in range(num_queries)]
+        scan_results, scan_elapsed = time_scan(game_table, limits)
+        index_results, build_elapsed, query_elapsed = time_index(game_table, limits)
+        assert scan_results == index_results
+        print(f"{num_queries:>6} queries: scan {scan_elapsed:.3f}s, index build {build_elapsed:.3f}s + queries {query_elapsed:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,19 @@
 import logging
+import os
 import re
+import sys
+from array import array
+from bisect import bisect_right
+
+if not __package__:
+    # run as a script from inside prob2/, so the top level modules aren't on
+    # the path yet
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrument import get_tracer, phase, set_tracing
+from parse_cache import cached_parse
 
 _logger = logging.getLogger(__name__)
+_trace = get_tracer(__name__)
 
 class PullInfo:
     def __init__(self):
@@ -50,7 +62,8 @@ def get_game_info(line):
 
         game_info.add_pull(pull_info)
 
-    _logger.debug(str(game_info))
+    if _trace.enabled:
+        _trace("%s", game_info)
     return game_info
 
 def is_game_possible(game_info, max_red, max_green, max_blue):
@@ -59,45 +72,244 @@ def is_game_possible(game_info, max_red, max_green, max_blue):
         possible = pull.red <= max_red and pull.blue <= max_blue and pull.green <= max_green
         if not possible:
             break
-    _logger.debug(f"game {game_info.id} possible: {possible}")
+    if _trace.enabled:
+        _trace("game %s possible: %s", game_info.id, possible)
     return possible
 
-def get_possible_games(all_game_infos, max_red, max_green, max_blue):
-    _logger.info(f"getting possible games for max red: {max_red}, max green: {max_green}, max blue: {max_blue}")
-    possible_games = []
-    for game_info in all_game_infos:
-        if is_game_possible(game_info, max_red, max_green, max_blue):
-            possible_games.append(game_info.id)
-    return possible_games
-
 def get_game_power(game_info):
     fewest_cubes = PullInfo()
     for pull in game_info.pulls:
         fewest_cubes.red = max(fewest_cubes.red, pull.red)
         fewest_cubes.green = max(fewest_cubes.green, pull.green)
         fewest_cubes.blue = max(fewest_cubes.blue, pull.blue)
-    _logger.debug(f"game {game_info.id} fewest cubes: {fewest_cubes}")
+    if _trace.enabled:
+        _trace("game %s fewest cubes: %s", game_info.id, fewest_cubes)
     return fewest_cubes.red * fewest_cubes.green * fewest_cubes.blue
 
-def get_game_powers(all_game_infos):
+class GameTable:
+    # Only the most of each color pulled matters to either question, so each
+    # game is kept as four ints in parallel arrays instead of a GameInfo.
+    def __init__(self):
+        self.ids = array('Q')
+        self.max_red = array('Q')
+        self.max_green = array('Q')
+        self.max_blue = array('Q')
+
+    def add_game(self, id, max_red, max_green, max_blue):
+        self.ids.append(id)
+        self.max_red.append(max_red)
+        self.max_green.append(max_green)
+        self.max_blue.append(max_blue)
+
+    def add_game_info(self, game_info):
+        self.add_game(
+            game_info.id,
+            max((pull.red for pull in game_info.pulls), default=0),
+            max((pull.green for pull in game_info.pulls), default=0),
+            max((pull.blue for pull in game_info.pulls), default=0),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return "\n".join(
+            f"Game {id}: max red: {red}, max green: {green}, max blue: {blue}"
+            for id, red, green, blue in zip(self.ids, self.max_red, self.max_green, self.max_blue))
+
+def get_possible_games(game_table, max_red, max_green, max_blue):
+    _logger.info(f"getting possible games for max red: {max_red}, max green: {max_green}, max blue: {max_blue}")
+    return [
+        id for id, red, green, blue in zip(game_table.ids, game_table.max_red, game_table.max_green, game_table.max_blue)
+        if red <= max_red and green <= max_green and blue <= max_blue
+    ]
+
+def get_game_powers(game_table):
     _logger.info(f"getting game powers")
-    return [get_game_power(game_info) for game_info in all_game_infos]
+    return [red * green * blue for red, green, blue in zip(game_table.max_red, game_table.max_green, game_table.max_blue)]
 
-def get_all_game_infos(input):
+class GameLimitIndex:
+    # Answers "sum and count of possible game ids" for any (max_red,
+    # max_green, max_blue) without looking at the games again. Reds and
+    # greens are ranked and nested into a 2D Fenwick tree: a game goes into
+    # every (red node, green node) pair covering its ranks, and each pair
+    # keeps its games' blues sorted with running id sums. A query walks the
+    # O(log reds * log greens) pairs covering its limits and bisects each
+    # one's blues. Every game is stored O(log reds * log greens) times, which
+    # stays small since only distinct counts are ranked.
+    def __init__(self, game_table):
+        self.reds = sorted(set(game_table.max_red))
+        self.greens = sorted(set(game_table.max_green))
+        red_ranks = {red: i + 1 for i, red in enumerate(self.reds)}
+        green_ranks = {green: i + 1 for i, green in enumerate(self.greens)}
+
+        # (red node, green node) --> [(blue, id), ...]
+        buckets = {}
+        for id, red, green, blue in zip(game_table.ids, game_table.max_red, game_table.max_green, game_table.max_blue):
+            red_node = red_ranks[red]
+            while red_node <= len(self.reds):
+                green_node = green_ranks[green]
+                while green_node <= len(self.greens):
+                    buckets.setdefault((red_node, green_node), []).append((blue, id))
+                    green_node += green_node & -green_node
+                red_node += red_node & -red_node
+
+        # (red node, green node) --> (sorted blues, id sums of the first k games)
+        self.nodes = {}
+        for node, games in buckets.items():
+            games.sort()
+            id_sums = [0]
+            for _, id in games:
+                id_sums.append(id_sums[-1] + id)
+            self.nodes[node] = ([blue for blue, _ in games], id_sums)
+
+    def query(self, max_red, max_green, max_blue):
+        # returns (sum of possible game ids, number of possible games)
+        id_sum = 0
+        count = 0
+        red_node = bisect_right(self.reds, max_red)
+        max_green_node = bisect_right(self.greens, max_green)
+        while red_node > 0:
+            green_node = max_green_node
+            while green_node > 0:
+                node = self.nodes.get((red_node, green_node))
+                if node is not None:
+                    blues, id_sums = node
+                    num_games = bisect_right(blues, max_blue)
+                    id_sum += id_sums[num_games]
+                    count += num_games
+                green_node -= green_node & -green_node
+            red_node -= red_node & -red_node
+        return id_sum, count
+
+    def query_many(self, limits):
+        return [self.query(max_red, max_green, max_blue) for max_red, max_green, max_blue in limits]
+
+_GAME_ID_RE = re.compile(r'Game (\d+): ')
+_COLOR_COUNT_RE = re.compile(r'(\d+) (red|green|blue)')
+# every pull's ", " separated color counts, pulls separated by "; "
+_PULLS_RE = re.compile(r'\d+ (?:red|green|blue)(?:(?:, |; )\d+ (?:red|green|blue))*')
+
+def get_game_maxes(line):
+    # Game 1: 3 blue, 4 red; 1 red, 2 green, 6 blue; 2 green
+    # pulls don't need to be kept apart, just the biggest count of each color
+    game_match = _GAME_ID_RE.match(line)
+    if not game_match:
+        raise RuntimeError(f"failed to parse {line}")
+    # findall would skip over anything it doesn't recognize, so check the
+    # whole line is color counts first
+    if not _PULLS_RE.fullmatch(line, game_match.end()):
+        raise RuntimeError(f"failed to parse {line}")
+    maxes = {"red": 0, "green": 0, "blue": 0}
+    for count_str, color_str in _COLOR_COUNT_RE.findall(line, game_match.end()):
+        maxes[color_str] = max(maxes[color_str], int(count_str))
+    return int(game_match.group(1)), maxes["red"], maxes["green"], maxes["blue"]
+
+def add_game_line(game_table, line):
+    game_table.add_game(*get_game_maxes(line))
+
+def get_game_totals(lines, max_red, max_green, max_blue):
+    # Folds each game into both answers as soon as it's parsed, so nothing is
+    # kept around and lines can come from an unbounded stream.
+    possible_id_sum = 0
+    power_sum = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        id, red, green, blue = get_game_maxes(line)
+        if red <= max_red and green <= max_green and blue <= max_blue:
+            possible_id_sum += id
+        power_sum += red * green * blue
+    return possible_id_sum, power_sum
+
+# bump when parsing, or how parsed games are cached, changes
+_PARSE_VERSION = 1
+
+def _parse_game_table(input):
+    game_table = GameTable()
+    with open(input) as f:
+        for line in f:
+            add_game_line(game_table, line.strip())
+    return game_table
+
+def _dump_game_table(game_table):
+    return [game_table.ids, game_table.max_red, game_table.max_green, game_table.max_blue]
+
+def _load_game_table(columns):
+    # the columns are read only views of the mapped cache file, so no more
+    # games can be added
+    game_table = GameTable()
+    game_table.ids, game_table.max_red, game_table.max_green, game_table.max_blue = columns
+    return game_table
+
+def get_game_table(input):
+    game_table = cached_parse(input, "prob2-game-table", _PARSE_VERSION, _parse_game_table, _dump_game_table, _load_game_table)
+    _logger.debug("%s", game_table)
+    return game_table
+
+def _parse_all_game_infos(input):
     all_game_infos = []
     with open(input) as f:
         for line in list(f):
             all_game_infos.append(get_game_info(line.strip()))
     return all_game_infos
 
+def _dump_all_game_infos(all_game_infos):
+    # every game's pulls laid end to end, and where each game's pulls stop
+    ids = array('Q')
+    pull_stops = array('Q')
+    reds = array('Q')
+    greens = array('Q')
+    blues = array('Q')
+    for game_info in all_game_infos:
+        ids.append(game_info.id)
+        for pull in game_info.pulls:
+            reds.append(pull.red)
+            greens.append(pull.green)
+            blues.append(pull.blue)
+        pull_stops.append(len(reds))
+    return [ids, pull_stops, reds, greens, blues]
+
+def _load_all_game_infos(columns):
+    ids, pull_stops, reds, greens, blues = columns
+    all_game_infos = []
+    pull_start = 0
+    for id, pull_stop in zip(ids, pull_stops):
+        game_info = GameInfo(id)
+        for idx in range(pull_start, pull_stop):
+            pull_info = PullInfo()
+            pull_info.red = reds[idx]
+            pull_info.green = greens[idx]
+            pull_info.blue = blues[idx]
+            game_info.add_pull(pull_info)
+        all_game_infos.append(game_info)
+        pull_start = pull_stop
+    return all_game_infos
+
+def get_all_game_infos(input):
+    return cached_parse(input, "prob2-game-infos", _PARSE_VERSION, _parse_all_game_infos, _dump_all_game_infos, _load_all_game_infos)
+
+def solve(input, max_red=12, max_green=13, max_blue=14):
+    with phase("get_game_table"):
+        game_table = get_game_table(input)
+    with phase("get_possible_games"):
+        possible_games = get_possible_games(game_table, max_red, max_green, max_blue)
+    print(f"Sum of Possible Game IDs: {sum(possible_games)}")
+
+    with phase("get_game_powers"):
+        game_powers = get_game_powers(game_table)
+    print(f"Sum of Game Powers: {sum(game_powers)}")
+
 def main():
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('--input', required=True)
-    parser.add_argument('--max-red', default=12)
-    parser.add_argument('--max-green', default=13)
-    parser.add_argument('--max-blue', default=14)
+    parser.add_argument('--input', required=True, help="games file, or - for stdin (streams)")
+    parser.add_argument('--stream', action='store_true', help="fold each game into the sums as it's read")
+    parser.add_argument('--max-red', type=int, default=12)
+    parser.add_argument('--max-green', type=int, default=13)
+    parser.add_argument('--max-blue', type=int, default=14)
     parser.add_argument('--verbose', '-v', action='count', default=0)
     args = parser.parse_args()
 
@@ -111,13 +323,21 @@ def main():
     }[verbosity]
     log_format = "[%(relativeCreated)6d] %(levelname)-5s %(funcName)s: %(message)s"
     logging.basicConfig(level=logging_level, format=log_format)
+    if logging_level == logging.DEBUG:
+        # -vv also traces every item the solver looks at
+        set_tracing(True)
 
-    all_game_infos = get_all_game_infos(args.input)
-    possible_games = get_possible_games(all_game_infos, args.max_red, args.max_green, args.max_blue)
-    print(f"Sum of Possible Game IDs: {sum(possible_games)}")
+    if args.stream or args.input == "-":
+        if args.input == "-":
+            possible_id_sum, power_sum = get_game_totals(sys.stdin, args.max_red, args.max_green, args.max_blue)
+        else:
+            with open(args.input) as f:
+                possible_id_sum, power_sum = get_game_totals(f, args.max_red, args.max_green, args.max_blue)
+        print(f"Sum of Possible Game IDs: {possible_id_sum}")
+        print(f"Sum of Game Powers: {power_sum}")
+        return
 
-    game_powers = get_game_powers(all_game_infos)
-    print(f"Sum of Game Powers: {sum(game_powers)}")
+    solve(args.input, args.max_red, args.max_green, args.max_blue)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import random
+import pytest
+from parse_cache import set_cache
+from prob2.go import GameLimitIndex, GameTable, add_game_line, get_all_game_infos, get_game_table, get_game_totals, get_game_info, get_game_power, get_game_powers, get_possible_games, is_game_possible
+
+GAMES = [
+    "Game 1: 3 blue, 4 red; 1 red, 2 green, 6 blue; 2 green",
+    "Game 2: 1 blue, 2 green; 3 green, 4 blue, 1 red; 1 green, 1 blue",
+    "Game 3: 8 green, 6 blue, 20 red; 5 blue, 4 red, 13 green; 5 green, 1 red",
+    "Game 4: 1 green, 3 red, 6 blue; 3 green, 6 red; 3 green, 15 blue, 14 red",
+    "Game 5: 6 red, 1 blue, 3 green; 2 blue, 1 red, 2 green",
+]
+
+@pytest.fixture
+def game_table():
+    game_table = GameTable()
+    for line in GAMES:
+        add_game_line(game_table, line)
+    return game_table
+
+def test_table_from_game_infos(game_table):
+    from_infos = GameTable()
+    for line in GAMES:
+        from_infos.add_game_info(get_game_info(line))
+    assert repr(from_infos) == repr(game_table)
+
+@pytest.mark.parametrize("limits", [(12, 13, 14), (0, 0, 0), (20, 13, 15), (6, 3, 6)])
+def test_possible_games(game_table, limits):
+    expected = [info.id for info in map(get_game_info, GAMES) if is_game_possible(info, *limits)]
+    assert get_possible_games(game_table, *limits) == expected
+
+def test_game_powers(game_table):
+    assert get_game_powers(game_table) == [get_game_power(get_game_info(line)) for line in GAMES]
+
+def test_limit_index(game_table):
+    limits = [(r, g, b) for r in range(0, 22, 3) for g in range(0, 15, 2) for b in range(0, 17, 4)]
+    expected = [(sum(games), len(games)) for games in (get_possible_games(game_table, *limit) for limit in limits)]
+    assert GameLimitIndex(game_table).query_many(limits) == expected
+
+def test_limit_index_random():
+    rng = random.Random(0)
+    game_table = GameTable()
+    for id in range(1, 300):
+        game_table.add_game(id, rng.randint(0, 1000), rng.randint(0, 1000), rng.randint(0, 1000))
+    limits = [(rng.randint(0, 1000), rng.randint(0, 1000), rng.randint(0, 1000)) for _ in range(200)]
+    expected = [(sum(games), len(games)) for games in (get_possible_games(game_table, *limit) for limit in limits)]
+    assert GameLimitIndex(game_table).query_many(limits) == expected
+
+def test_limit_index_empty():
+    assert GameLimitIndex(GameTable()).query(12, 13, 14) == (0, 0)
+
+def test_game_totals(game_table):
+    possible_games = get_possible_games(game_table, 12, 13, 14)
+    assert get_game_totals(GAMES + [""], 12, 13, 14) == (sum(possible_games), sum(get_game_powers(game_table)))
+
+def test_parse_cache(tmp_path, game_table):
+    input = tmp_path / "games.txt"
+    input.write_text("\n".join(GAMES))
+    set_cache(str(tmp_path / "cache"))
+    try:
+        # the first time parses and fills the cache, the second loads it
+        for _ in range(2):
+            assert repr(get_game_table(input)) == repr(game_table)
+            assert repr(get_all_game_infos(input)) == repr([get_game_info(line) for line in GAMES])
+    finally:
+        set_cache(None)
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+
+@pytest.mark.parametrize("line", ["Game 1: 3 blue, 4 purple; 99red", "Game 1: ", "Game 1: 3 blue,, 4 red", "Game 1: 3 blue; 4 red;"])
+def test_game_maxes_bad_line(line):
+    with pytest.raises(RuntimeError):
+        add_game_line(GameTable(), line)
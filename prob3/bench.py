@@ -0,0 +1,59 @@
+import logging
+import os
+import tempfile
+import time
+from prob3.go import Row, Schematic, get_schematic_totals_parallel, get_masked_gear_ratios, get_masked_part_numbers, get_symbol_masks
+
+_logger = logging.getLogger(__name__)
+
+def get_wide_schematic(lines, tiles):
+    # tile each row sideways; a '.' between tiles keeps numbers from joining
+    schematic = Schematic()
+    for line in lines:
+        schematic.add_row(Row(".".join([line] * tiles)))
+    return schematic
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', required=True)
+    parser.add_argument('--tiles', type=int, action='append', help="times to tile each row sideways")
+    parser.add_argument('--tall', type=int, default=0, help="also time --workers on the schematic tiled this many times downwards")
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        lines = [line.strip() for line in f]
+
+    for tiles in args.tiles or [10, 40, 80]:
+        start = time.perf_counter()
+        schematic = get_wide_schematic(lines, tiles)
+        parse_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        part_number_sum = sum(schematic.get_part_numbers())
+        gear_ratio_sum = sum(schematic.get_gear_ratios())
+        solve_elapsed = time.perf_counter() - start
+        print(f"{schematic.width:>6} columns x {len(schematic.rows)} rows: parse {parse_elapsed:.3f}s, solve {solve_elapsed:.3f}s (parts {part_number_sum}, gears {gear_ratio_sum})")
+
+        start = time.perf_counter()
+        grid = [".".join([line] * tiles).encode() for line in lines]
+        part_number_sum = sum(get_masked_part_numbers(grid, get_symbol_masks(grid)))
+        gear_ratio_sum = sum(get_masked_gear_ratios(grid))
+        mask_elapsed = time.perf_counter() - start
+        print(f"{'':>6}   mask engine: {mask_elapsed:.3f}s (parts {part_number_sum}, gears {gear_ratio_sum})")
+
+    if args.tall:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tall_input = os.path.join(tmp_dir, "schematic.txt")
+            with open(tall_input, 'w') as f:
+                for _ in range(args.tall):
+                    f.write("\n".join(lines) + "\n")
+            for workers in (1, 2, 4, 8):
+                start = time.perf_counter()
+                part_number_sum, gear_ratio_sum = get_schematic_totals_parallel(tall_input, workers)
+                elapsed = time.perf_counter() - start
+                print(f"{len(lines) * args.tall} rows, {workers} workers: {elapsed:.3f}s (parts {part_number_sum}, gears {gear_ratio_sum})")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
 import logging
+import os
 import re
+import sys
+from array import array
+from bisect import bisect_right
 from enum import Enum
 
+if not __package__:
+    # run as a script from inside prob3/, so the top level modules aren't on
+    # the path yet
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrument import get_tracer, phase, set_tracing
+from parse_cache import cached_parse
+
 _logger = logging.getLogger(__name__)
+_trace = get_tracer(__name__)
 
 class ComponentType(Enum):
     EMPTY = 0
@@ -18,12 +30,18 @@ class Component:
         self.width = width
 
 class Row:
-    def __init__(self, raw_line):
+    def __init__(self, raw_line, comps=None):
         self.raw_line = raw_line
         self.comps = []
+        if comps is not None:
+            # already split up, like when loaded from the parse cache
+            self.comps = comps
+            self.comp_starts = [comp.pos for comp in self.comps]
+            return
 
         components = re.split(r'(\d+|[!@#$%^&*\\/\+=-])', self.raw_line)
-        _logger.debug(components)
+        if _trace.enabled:
+            _trace("%s", components)
 
         pos = 0
         for comp in components:
@@ -34,7 +52,7 @@ class Row:
             num_match = re.match(r'\d+', comp)
             gear_match = re.match(f'\*', comp)
             symbol_match = re.match(r'[!@#$%^&*\\/\+=-]', comp)
-            empty_match = re.match(r'\.+', comp)
+            empty_match = re.fullmatch(r'\.+', comp)
             if num_match:
                 self.comps.append(Component(ComponentType.NUMBER, int(comp), pos, len(comp)))
             elif gear_match:
@@ -48,6 +66,10 @@ class Row:
                 raise RuntimeError(f"unexpected components {comp}")
             pos += len(comp)
 
+        # the components tile the row, so their start offsets are already
+        # sorted and the one covering any x can be found with bisect
+        self.comp_starts = [comp.pos for comp in self.comps]
+
     def get_numbers(self):
         return [comp for comp in self.comps if comp.type == ComponentType.NUMBER]
 
@@ -57,21 +79,19 @@ class Row:
     def get_comps_in_block(self, start_x, end_x, types):
         # start and end is inclusive
         comps = []
-        for comp in self.comps:
+        # first component that ends at or after start_x
+        #  ....xxx....
+        #  ..yyyy.....
+        idx = max(0, bisect_right(self.comp_starts, start_x) - 1)
+        while idx < len(self.comps):
+            comp = self.comps[idx]
+            # ....xxx....
+            # ........yy.
+            if comp.pos > end_x:
+                break
             if comp.type in types:
-                comp_start = comp.pos
-                comp_end = comp.pos + comp.width - 1
-
-                # ....xxx....
-                # .yy........
-                component_before = comp_end < start_x
-                # ....xxx....
-                # ........yy.
-                component_after = comp_start > end_x
-
-                # it must intersect!
-                if not component_before and not component_after:
-                    comps.append(comp)
+                comps.append(comp)
+            idx += 1
         return comps
 
     def __repr__(self):
@@ -87,10 +107,57 @@ class Row:
         last_comp = self.comps[-1]
         return last_comp.pos + last_comp.width
 
+def get_comps_adjacent(rows, comp, y, width, types):
+    # start and end is inclusive
+    start_x = max(0, comp.pos - 1)
+    start_y = max(0, y - 1)
+    end_x = min(width - 1, comp.pos + comp.width)
+    end_y = min(len(rows) - 1, y + 1)
+    if _trace.enabled:
+        _trace("looking for %s in (%s, %s) --> (%s, %s)", types, start_x, start_y, end_x, end_y)
+
+    comps = []
+    for y in range(start_y, end_y + 1):
+        comps.extend(rows[y].get_comps_in_block(start_x, end_x, types))
+    return comps
+
+def get_row_part_numbers(rows, y, width):
+    # part number is any number adjacent to a symbol
+    part_numbers = []
+    for number in rows[y].get_numbers():
+        adjacent_comps = get_comps_adjacent(rows, number, y, width, [ComponentType.GEAR, ComponentType.SYMBOL])
+        if len(adjacent_comps) > 0:
+            if _trace.enabled:
+                _trace("%s is a part number", number.value)
+            part_numbers.append(number.value)
+        elif _trace.enabled:
+            _trace("%s is NOT a part number", number.value)
+    return part_numbers
+
+def get_row_gear_ratios(rows, y, width):
+    # a gear is any * symbol that is adjacent to exactly two part numbers
+    gear_ratios = []
+    for gear in rows[y].get_gears():
+        adjacent_comps = get_comps_adjacent(rows, gear, y, width, [ComponentType.NUMBER])
+        if len(adjacent_comps) == 2:
+            if _trace.enabled:
+                _trace("(%s, %s) is a gear", gear.pos, y)
+            # ratio is the two number values multiplied
+            gear_ratios.append(adjacent_comps[0].value * adjacent_comps[1].value)
+        elif _trace.enabled:
+            _trace("(%s, %s) is NOT a gear", gear.pos, y)
+    return gear_ratios
+
 class Schematic:
     def __init__(self):
         self.rows = []
         self.width = -1
+        # (part numbers, gear ratios) per row, filled in by the first call to
+        # get_part_number_sum or get_gear_ratio_sum and kept up to date by
+        # set_cell
+        self._row_results = None
+        self._part_number_sum = 0
+        self._gear_ratio_sum = 0
 
     def add_row(self, row):
         if self.width < 0:
@@ -98,64 +165,303 @@ class Schematic:
         elif self.width != len(row):
             raise RuntimeError(f"Width of {str(row)} doesn't match existing width, {self.width}")
         self.rows.append(row)
+        self._row_results = None
 
-    def _get_comps_adjacent(self, comp, y, types):
-        # start and end is inclusive
-        start_x = max(0, comp.pos - 1)
-        start_y = max(0, y - 1)
-        end_x = min(self.width - 1, comp.pos + comp.width)
-        end_y = min(len(self.rows) - 1, y + 1)
-        _logger.debug(f"looking for {types} in ({start_x}, {start_y}) --> ({end_x}, {end_y})")
+    def _get_row_results(self):
+        if self._row_results is None:
+            self._row_results = [
+                (get_row_part_numbers(self.rows, y, self.width), get_row_gear_ratios(self.rows, y, self.width))
+                for y in range(len(self.rows))
+            ]
+            self._part_number_sum = sum(sum(part_numbers) for part_numbers, _ in self._row_results)
+            self._gear_ratio_sum = sum(sum(gear_ratios) for _, gear_ratios in self._row_results)
+        return self._row_results
 
-        comps = []
-        for y in range(start_y, end_y + 1):
-            comps.extend(self.rows[y].get_comps_in_block(start_x, end_x, types))
-        return comps
+    def get_part_number_sum(self):
+        self._get_row_results()
+        return self._part_number_sum
+
+    def get_gear_ratio_sum(self):
+        self._get_row_results()
+        return self._gear_ratio_sum
+
+    def set_cell(self, x, y, ch):
+        # Only rows y-1, y and y+1 can see the changed cell, so only their
+        # results are redone and swapped into the running sums.
+        if len(ch) != 1:
+            raise RuntimeError(f"expected a single character, got {ch}")
+        if not 0 <= x < self.width or not 0 <= y < len(self.rows):
+            raise RuntimeError(f"({x}, {y}) is outside of the schematic")
+        raw_line = self.rows[y].raw_line
+        self.rows[y] = Row(raw_line[:x] + ch + raw_line[x+1:])
+
+        if self._row_results is None:
+            return
+        for changed_y in range(max(0, y - 1), min(len(self.rows), y + 2)):
+            old_part_numbers, old_gear_ratios = self._row_results[changed_y]
+            part_numbers = get_row_part_numbers(self.rows, changed_y, self.width)
+            gear_ratios = get_row_gear_ratios(self.rows, changed_y, self.width)
+            self._part_number_sum += sum(part_numbers) - sum(old_part_numbers)
+            self._gear_ratio_sum += sum(gear_ratios) - sum(old_gear_ratios)
+            self._row_results[changed_y] = (part_numbers, gear_ratios)
+
+    def _get_comps_adjacent(self, comp, y, types):
+        return get_comps_adjacent(self.rows, comp, y, self.width, types)
 
     def get_part_numbers(self):
-        # part number is any number adjacent to a symbol
         part_numbers = []
-        for y, row in enumerate(self.rows):
-            for number in row.get_numbers():
-                adjacent_comps = self._get_comps_adjacent(number, y, [ComponentType.GEAR, ComponentType.SYMBOL])
-                if len(adjacent_comps) > 0:
-                    _logger.debug(f"{number.value} is a part number")
-                    part_numbers.append(number.value)
-                else:
-                    _logger.debug(f"{number.value} is NOT a part number")
+        for y in range(len(self.rows)):
+            part_numbers.extend(get_row_part_numbers(self.rows, y, self.width))
         return part_numbers
 
     def get_gear_ratios(self):
-        # a gear is any * symbol that is adjacent to exactly two part numbers
         gear_ratios = []
-        for y, row in enumerate(self.rows):
-            for gear in row.get_gears():
-                adjacent_comps = self._get_comps_adjacent(gear, y, [ComponentType.NUMBER])
-                if len(adjacent_comps) == 2:
-                    _logger.debug(f"({gear.pos}, {y}) is a gear")
-                    # ratio is the two number values multiplied
-                    gear_ratios.append(adjacent_comps[0].value * adjacent_comps[1].value)
-                else:
-                    _logger.debug(f"({gear.pos}, {y}) is NOT a gear")
+        for y in range(len(self.rows)):
+            gear_ratios.extend(get_row_gear_ratios(self.rows, y, self.width))
         return gear_ratios
 
     def __repr__(self):
         return "\n".join([str(row) for row in self.rows])
 
-def get_schematic(input):
+def stream_schematic(lines):
+    # Only the rows above and below matter to a row, so keep a window of three
+    # and yield (part numbers, gear ratios) for the middle row once the row
+    # below it has been read. Memory stays at three rows no matter how tall
+    # the schematic is.
+    window = []
+    width = -1
+    for line in lines:
+        row = Row(line.strip())
+        if width < 0:
+            width = len(row)
+        elif width != len(row):
+            raise RuntimeError(f"Width of {str(row)} doesn't match existing width, {width}")
+
+        window.append(row)
+        if len(window) > 3:
+            window.pop(0)
+        if len(window) > 1:
+            # the row before the one just read is finished
+            y = len(window) - 2
+            yield get_row_part_numbers(window, y, width), get_row_gear_ratios(window, y, width)
+
+    if window:
+        y = len(window) - 1
+        yield get_row_part_numbers(window, y, width), get_row_gear_ratios(window, y, width)
+
+def get_schematic_totals(lines):
+    part_number_sum = 0
+    gear_ratio_sum = 0
+    for part_numbers, gear_ratios in stream_schematic(lines):
+        part_number_sum += sum(part_numbers)
+        gear_ratio_sum += sum(gear_ratios)
+    return part_number_sum, gear_ratio_sum
+
+# bump when parsing, or how a parsed schematic is cached, changes
+_PARSE_VERSION = 1
+
+def _parse_schematic(input):
     schematic = Schematic()
     with open(input) as f:
         for line in list(f):
             schematic.add_row(Row(line.strip()))
+    return schematic
+
+def _dump_schematic(schematic):
+    # the rows' text end to end, where each row's text and components stop,
+    # each component's type, position and width, and each number's value
+    text = array('B')
+    text_stops = array('Q')
+    comp_stops = array('Q')
+    types = array('B')
+    positions = array('I')
+    widths = array('I')
+    values = array('Q')
+    for row in schematic.rows:
+        text.frombytes(row.raw_line.encode())
+        text_stops.append(len(text))
+        for comp in row.comps:
+            types.append(comp.type.value)
+            positions.append(comp.pos)
+            widths.append(comp.width)
+            if comp.type == ComponentType.NUMBER:
+                values.append(comp.value)
+        comp_stops.append(len(types))
+    return [text, text_stops, comp_stops, types, positions, widths, values]
 
-    _logger.debug(str(schematic))
+_COMPONENT_TYPES = {type.value: type for type in ComponentType}
+
+def _load_schematic(columns):
+    text, text_stops, comp_stops, types, positions, widths, values = columns
+    schematic = Schematic()
+    text_start = 0
+    comp_start = 0
+    values = iter(values)
+    for text_stop, comp_stop in zip(text_stops, comp_stops):
+        raw_line = bytes(text[text_start:text_stop]).decode()
+        comps = []
+        for idx in range(comp_start, comp_stop):
+            type = _COMPONENT_TYPES[types[idx]]
+            pos = positions[idx]
+            width = widths[idx]
+            value = next(values) if type == ComponentType.NUMBER else raw_line[pos:pos + width]
+            comps.append(Component(type, value, pos, width))
+        schematic.add_row(Row(raw_line, comps))
+        text_start = text_stop
+        comp_start = comp_stop
     return schematic
 
+def get_schematic(input):
+    schematic = cached_parse(input, "prob3-schematic", _PARSE_VERSION, _parse_schematic, _dump_schematic, _load_schematic)
+    _logger.debug("%s", schematic)
+    return schematic
+
+def get_tile_totals(input, start_y, stop_y, line_bytes):
+    # Solve rows [start_y, stop_y) with one halo row on each side. Halo rows
+    # are only looked at, never solved, so each number and gear is counted by
+    # exactly one tile: the one owning its row.
+    halo_start_y = max(0, start_y - 1)
+    rows = []
+    with open(input, 'rb') as f:
+        f.seek(halo_start_y * line_bytes)
+        for _ in range(halo_start_y, stop_y + 1):
+            line = f.readline()
+            if not line:
+                break
+            rows.append(Row(line.decode().strip()))
+
+    width = len(rows[0])
+    for row in rows:
+        if len(row) != width:
+            raise RuntimeError(f"Width of {str(row)} doesn't match existing width, {width}")
+
+    part_number_sum = 0
+    gear_ratio_sum = 0
+    for y in range(start_y - halo_start_y, stop_y - halo_start_y):
+        part_number_sum += sum(get_row_part_numbers(rows, y, width))
+        gear_ratio_sum += sum(get_row_gear_ratios(rows, y, width))
+    _logger.debug(f"tile [{start_y}, {stop_y}): {part_number_sum}, {gear_ratio_sum}")
+    return part_number_sum, gear_ratio_sum
+
+def get_schematic_totals_parallel(input, workers):
+    # every row is the same width, so row y starts at y * line_bytes and the
+    # tiles can find their rows without reading the rest of the file
+    from concurrent.futures import ProcessPoolExecutor
+
+    with open(input, 'rb') as f:
+        line_bytes = len(f.readline())
+    num_rows = -(-os.path.getsize(input) // line_bytes)
+    tile_height = -(-num_rows // workers)
+    tiles = [(start_y, min(num_rows, start_y + tile_height)) for start_y in range(0, num_rows, tile_height)]
+    _logger.info(f"solving {num_rows} rows in {len(tiles)} tiles")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(get_tile_totals, input, start_y, stop_y, line_bytes) for start_y, stop_y in tiles]
+        results = [future.result() for future in futures]
+    return sum(part_number_sum for part_number_sum, _ in results), sum(gear_ratio_sum for _, gear_ratio_sum in results)
+
+# The mask engine below solves both parts on the raw bytes of the grid
+# instead of building Components, for grids too big for that to be practical.
+
+# 1 for every symbol byte, 0 for everything else
+_SYMBOL_MASK_BYTES = bytes(0 if ch == ord('.') or ord('0') <= ch <= ord('9') else 1 for ch in range(256))
+_DIGIT_RUN_RE = re.compile(rb'\d+')
+
+# everything Row knows how to split up
+_GRID_BYTES = b'.0123456789!@#$%^&*\\/+=-'
+
+def get_grid(input):
+    with open(input, 'rb') as f:
+        grid = [line.strip() for line in f.read().splitlines()]
+    for row in grid:
+        if len(row) != len(grid[0]):
+            raise RuntimeError(f"Width of {row.decode()} doesn't match existing width, {len(grid[0])}")
+        # anything else would count as a symbol here but Row rejects it
+        unexpected = row.translate(None, _GRID_BYTES)
+        if unexpected:
+            raise RuntimeError(f"unexpected components {unexpected.decode(errors='replace')}")
+    return grid
+
+def get_symbol_masks(grid):
+    # Each row's symbol mask is packed into an int with one byte per column,
+    # so shifting by 8 bits moves the whole mask one column. ORing each row
+    # with itself shifted both ways, then with the rows above and below,
+    # dilates every symbol to the 3x3 block around it in a few big-int ops.
+    if not grid:
+        return []
+    width = len(grid[0])
+    full_mask = (1 << (8 * width)) - 1
+    row_masks = []
+    for row in grid:
+        mask = int.from_bytes(row.translate(_SYMBOL_MASK_BYTES), 'big')
+        row_masks.append(mask | ((mask << 8) & full_mask) | (mask >> 8))
+
+    dilated = []
+    for y, mask in enumerate(row_masks):
+        if y > 0:
+            mask |= row_masks[y - 1]
+        if y < len(row_masks) - 1:
+            mask |= row_masks[y + 1]
+        dilated.append(mask.to_bytes(width, 'big'))
+    return dilated
+
+def get_masked_part_numbers(grid, symbol_masks):
+    # part number is any number with a dilated symbol under any of its digits
+    part_numbers = []
+    for row, symbol_mask in zip(grid, symbol_masks):
+        for number_match in _DIGIT_RUN_RE.finditer(row):
+            if symbol_mask.find(1, number_match.start(), number_match.end()) >= 0:
+                part_numbers.append(int(number_match.group()))
+    return part_numbers
+
+def get_masked_gear_ratios(grid):
+    # label every cell of a number with that number's index (0 means no
+    # number), then a gear's neighbours are just the labels around it
+    if not grid:
+        return []
+    width = len(grid[0])
+    numbers = [0]
+    labels = []
+    for row in grid:
+        row_labels = array('L', [0]) * width
+        for number_match in _DIGIT_RUN_RE.finditer(row):
+            row_labels[number_match.start():number_match.end()] = array('L', [len(numbers)]) * len(number_match.group())
+            numbers.append(int(number_match.group()))
+        labels.append(row_labels)
+
+    # a gear is any * symbol that is adjacent to exactly two part numbers
+    gear_ratios = []
+    for y, row in enumerate(grid):
+        x = row.find(b'*')
+        while x >= 0:
+            adjacent = set()
+            for row_labels in labels[max(0, y - 1):y + 2]:
+                adjacent.update(row_labels[max(0, x - 1):x + 2])
+            adjacent.discard(0)
+            if len(adjacent) == 2:
+                first, second = adjacent
+                gear_ratios.append(numbers[first] * numbers[second])
+            x = row.find(b'*', x + 1)
+    return gear_ratios
+
+def solve(input):
+    with phase("get_schematic"):
+        schematic = get_schematic(input)
+    with phase("get_part_numbers"):
+        part_numbers = schematic.get_part_numbers()
+    print(f"Sum of Part Numbers: {sum(part_numbers)}")
+    with phase("get_gear_ratios"):
+        gear_ratios = schematic.get_gear_ratios()
+    print(f"Sum of Gear Ratios: {sum(gear_ratios)}")
+
 def main():
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('--input', required=True)
+    parser.add_argument('--input', required=True, help="schematic file, or - for stdin (streams)")
+    parser.add_argument('--engine', choices=["comps", "mask"], default="comps")
+    parser.add_argument('--workers', type=int, default=1, help="solve tiles of rows in a process pool")
+    parser.add_argument('--stream', action='store_true', help="solve three rows at a time as they're read")
     parser.add_argument('--verbose', '-v', action='count', default=0)
     args = parser.parse_args()
 
@@ -169,12 +475,35 @@ def main():
     }[verbosity]
     log_format = "[%(relativeCreated)6d] %(levelname)-5s %(funcName)s: %(message)s"
     logging.basicConfig(level=logging_level, format=log_format)
+    if logging_level == logging.DEBUG:
+        # -vv also traces every item the solver looks at
+        set_tracing(True)
 
-    schematic = get_schematic(args.input)
-    part_numbers = schematic.get_part_numbers()
-    print(f"Sum of Part Numbers: {sum(part_numbers)}")
-    gear_ratios = schematic.get_gear_ratios()
-    print(f"Sum of Gear Ratios: {sum(gear_ratios)}")
+    if args.stream or args.input == "-":
+        if args.input == "-":
+            part_number_sum, gear_ratio_sum = get_schematic_totals(sys.stdin)
+        else:
+            with open(args.input) as f:
+                part_number_sum, gear_ratio_sum = get_schematic_totals(f)
+        print(f"Sum of Part Numbers: {part_number_sum}")
+        print(f"Sum of Gear Ratios: {gear_ratio_sum}")
+        return
+
+    if args.workers > 1:
+        part_number_sum, gear_ratio_sum = get_schematic_totals_parallel(args.input, args.workers)
+        print(f"Sum of Part Numbers: {part_number_sum}")
+        print(f"Sum of Gear Ratios: {gear_ratio_sum}")
+        return
+
+    if args.engine == "mask":
+        grid = get_grid(args.input)
+        part_numbers = get_masked_part_numbers(grid, get_symbol_masks(grid))
+        print(f"Sum of Part Numbers: {sum(part_numbers)}")
+        gear_ratios = get_masked_gear_ratios(grid)
+        print(f"Sum of Gear Ratios: {sum(gear_ratios)}")
+        return
+
+    solve(args.input)
 
 
 if __name__ == "__main__":
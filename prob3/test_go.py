@@ -0,0 +1,112 @@
+import pytest
+from parse_cache import set_cache
+from prob3.go import ComponentType, Row, Schematic, get_schematic, get_masked_gear_ratios, get_masked_part_numbers, get_schematic_totals, get_schematic_totals_parallel, get_grid, get_symbol_masks
+
+SCHEMATIC = [
+    "467..114..",
+    "...*......",
+    "..35..633.",
+    "......#...",
+    "617*......",
+    ".....+.58.",
+    "..592.....",
+    "......755.",
+    "...$.*....",
+    ".664.598..",
+]
+
+@pytest.fixture
+def schematic():
+    schematic = Schematic()
+    for line in SCHEMATIC:
+        schematic.add_row(Row(line))
+    return schematic
+
+def test_part_numbers(schematic):
+    assert sum(schematic.get_part_numbers()) == 4361
+
+def test_gear_ratios(schematic):
+    assert sum(schematic.get_gear_ratios()) == 467835
+
+@pytest.mark.parametrize(
+    "start_x,end_x,expected",
+    [(0, 0, [467]),
+     (2, 5, [467, 114]),
+     (3, 4, []),
+     (7, 9, [114]),
+     (8, 20, []),
+])
+def test_comps_in_block(start_x, end_x, expected):
+    row = Row(SCHEMATIC[0])
+    assert [comp.value for comp in row.get_comps_in_block(start_x, end_x, [ComponentType.NUMBER])] == expected
+
+@pytest.mark.parametrize("num_rows", [1, 2, 3, len(SCHEMATIC)])
+def test_schematic_totals(num_rows):
+    schematic = Schematic()
+    for line in SCHEMATIC[:num_rows]:
+        schematic.add_row(Row(line))
+    expected = (sum(schematic.get_part_numbers()), sum(schematic.get_gear_ratios()))
+    assert get_schematic_totals(SCHEMATIC[:num_rows]) == expected
+
+def test_mask_engine(schematic):
+    grid = [line.encode() for line in SCHEMATIC]
+    assert get_masked_part_numbers(grid, get_symbol_masks(grid)) == schematic.get_part_numbers()
+    assert get_masked_gear_ratios(grid) == schematic.get_gear_ratios()
+
+def test_set_cell(schematic):
+    import random
+    rng = random.Random(3)
+    assert (schematic.get_part_number_sum(), schematic.get_gear_ratio_sum()) == (4361, 467835)
+    for _ in range(200):
+        x = rng.randrange(schematic.width)
+        y = rng.randrange(len(schematic.rows))
+        schematic.set_cell(x, y, rng.choice(".....0123456789*#$"))
+
+        expected = Schematic()
+        for row in schematic.rows:
+            expected.add_row(Row(row.raw_line))
+        assert schematic.get_part_number_sum() == sum(expected.get_part_numbers())
+        assert schematic.get_gear_ratio_sum() == sum(expected.get_gear_ratios())
+
+def test_set_cell_outside(schematic):
+    with pytest.raises(RuntimeError):
+        schematic.set_cell(len(SCHEMATIC[0]), 0, ".")
+
+@pytest.mark.parametrize("workers", [1, 2, 3, 4, 10, 20])
+def test_schematic_totals_parallel(tmp_path, workers):
+    input = tmp_path / "schematic.txt"
+    input.write_text("\n".join(SCHEMATIC) + "\n")
+    assert get_schematic_totals_parallel(input, workers) == (4361, 467835)
+
+def test_parse_cache(tmp_path, schematic):
+    input = tmp_path / "schematic.txt"
+    input.write_text("\n".join(SCHEMATIC))
+    set_cache(str(tmp_path / "cache"))
+    try:
+        get_schematic(input)
+        cached = get_schematic(input)
+    finally:
+        set_cache(None)
+    assert repr(cached) == repr(schematic)
+    assert [[(comp.type, comp.value, comp.pos, comp.width) for comp in row.comps] for row in cached.rows] == \
+        [[(comp.type, comp.value, comp.pos, comp.width) for comp in row.comps] for row in schematic.rows]
+    assert cached.get_part_number_sum() == 4361
+    # rows loaded from the cache can still be edited
+    cached.set_cell(3, 1, ".")
+    assert cached.get_gear_ratio_sum() == 467835 - 467 * 35
+
+@pytest.mark.parametrize("char", ["a", "?", " "])
+def test_unexpected_components(tmp_path, char):
+    input = tmp_path / "schematic.txt"
+    input.write_text("\n".join(SCHEMATIC[:4] + [SCHEMATIC[4][:5] + char + SCHEMATIC[4][6:]] + SCHEMATIC[5:]) + "\n")
+    with pytest.raises(RuntimeError, match="unexpected components"):
+        get_schematic(input)
+    with pytest.raises(RuntimeError, match="unexpected components"):
+        get_grid(input)
+
+def test_grid_crlf(tmp_path, schematic):
+    input = tmp_path / "schematic.txt"
+    input.write_bytes(b"\r\n".join(line.encode() for line in SCHEMATIC + ["\\" + SCHEMATIC[0][1:]]) + b"\r\n")
+    grid = get_grid(input)
+    assert grid[:-1] == [line.encode() for line in SCHEMATIC]
+    assert get_masked_part_numbers(grid, get_symbol_masks(grid)) == schematic.get_part_numbers() + [67]
@@ -1,81 +1,404 @@
 import logging
+import mmap
+import os
 import re
-from enum import Enum
+import sys
+from array import array
+from collections import deque
+from operator import add
+
+if not __package__:
+    # run as a script from inside prob4/, so the top level modules aren't on
+    # the path yet
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrument import get_tracer, phase, set_tracing
+from parse_cache import cached_parse
 
 _logger = logging.getLogger(__name__)
+_trace = get_tracer(__name__)
+
+# Masks are fixed at this many bits, so numbers 0 to MASK_BITS - 1. A card
+# with a number outside that keeps a frozenset instead, so one huge number
+# can't make a huge int.
+MASK_BITS = 128
+
+def get_mask(numbers):
+    # bit N set if N is in numbers, or a frozenset of them if any won't fit
+    numbers = list(numbers)
+    mask = 0
+    for number in numbers:
+        if not 0 <= number < MASK_BITS:
+            return frozenset(numbers)
+        mask |= 1 << number
+    return mask
+
+def get_mask_numbers(mask):
+    if isinstance(mask, frozenset):
+        return set(mask)
+    return {number for number in range(mask.bit_length()) if mask >> number & 1}
+
+def get_points_for_matches(num_matches):
+    if num_matches == 0:
+        return 0
+    return 2 ** (num_matches - 1)
 
 class Scratcher:
-    def __init__(self, card_number):
+    # Numbers are kept as bitmasks (bit N set if N is on the card), so a
+    # card's matches are one AND and a popcount. That's only done once; the
+    # count is cached since playing asks for it again for every copy. Cards
+    # with numbers too big for a mask (see get_mask) hold frozensets and are
+    # matched as sets.
+    __slots__ = ("card_number", "winning_mask", "my_mask", "_num_matches")
+
+    def __init__(self, card_number, winning_mask=0, my_mask=0):
         self.card_number = card_number
-        self.winning_numbers = set()
-        self.my_numbers = set()
+        self.winning_mask = winning_mask
+        self.my_mask = my_mask
+        self._num_matches = None
+
+    @property
+    def winning_numbers(self):
+        return get_mask_numbers(self.winning_mask)
+
+    @property
+    def my_numbers(self):
+        return get_mask_numbers(self.my_mask)
 
     def __repr__(self):
         return f"Card {self.card_number}: {self.winning_numbers} | {self.my_numbers}"
 
     def num_matches(self):
-        intersection = self.winning_numbers & self.my_numbers
-        return len(intersection)
+        if self._num_matches is None:
+            if isinstance(self.winning_mask, int) and isinstance(self.my_mask, int):
+                self._num_matches = bin(self.winning_mask & self.my_mask).count("1")
+            else:
+                self._num_matches = len(self.winning_numbers & self.my_numbers)
+        return self._num_matches
 
     def get_points(self):
         num_matches = self.num_matches()
-        if num_matches == 0:
-            points = 0
-        else:
-            points = 2 ** (num_matches - 1)
-        _logger.debug(f"Card {self.card_number}: {num_matches} matches: {points} points")
+        points = get_points_for_matches(num_matches)
+        if _trace.enabled:
+            _trace("Card %s: %s matches: %s points", self.card_number, num_matches, points)
         return points
 
+_SCRATCHER_RE = re.compile(r'Card\s+(\d+): ([\d ]+) \| ([\d ]+)')
+
 def get_scratcher(line):
-    scratch_match = re.match(r'Card\s+(\d+): ([\d ]+) \| ([\d ]+)', line)
+    scratch_match = _SCRATCHER_RE.match(line)
     if not scratch_match:
         raise RuntimeError(f"failed to parse scratcher: {line}")
 
-    scratcher = Scratcher(int(scratch_match.group(1)))
-    for winning_number_raw in scratch_match.group(2).split():
-        scratcher.winning_numbers.add(int(winning_number_raw))
+    scratcher = Scratcher(
+        int(scratch_match.group(1)),
+        get_mask(map(int, scratch_match.group(2).split())),
+        get_mask(map(int, scratch_match.group(3).split())),
+    )
 
-    for my_number_raw in scratch_match.group(3).split():
-        scratcher.my_numbers.add(int(my_number_raw))
-
-    _logger.debug(str(scratcher))
+    if _trace.enabled:
+        _trace("%s", scratcher)
     return scratcher
 
 
-def get_scratchers(input):
-    scratchers = []
+def get_match_counts(input):
+    # Only the number of matches matters for points and for playing, so for
+    # really big decks keep just that, one byte per card, and drop each
+    # Scratcher as soon as it's counted. A card with more matches than a byte
+    # holds switches the whole array to four bytes per card.
+    match_counts = array('B')
+    with open(input) as f:
+        for line in f:
+            num_matches = get_scratcher(line.strip()).num_matches()
+            if num_matches > 0xff and match_counts.typecode == 'B':
+                match_counts = array('L', match_counts)
+            match_counts.append(num_matches)
+    return match_counts
+
+
+# bump when parsing, or how parsed cards are cached, changes
+_PARSE_VERSION = 2
+
+def _parse_scratchers(input):
     with open(input) as f:
         return [get_scratcher(line.strip()) for line in list(f)]
-    return schematic
+
+def _dump_scratchers(scratchers):
+    # every card's numbers end to end, and where each card's numbers stop
+    card_numbers = array('Q')
+    winning_stops = array('Q')
+    winning_numbers = array('Q')
+    my_stops = array('Q')
+    my_numbers = array('Q')
+    for scratcher in scratchers:
+        card_numbers.append(scratcher.card_number)
+        winning_numbers.extend(scratcher.winning_numbers)
+        winning_stops.append(len(winning_numbers))
+        my_numbers.extend(scratcher.my_numbers)
+        my_stops.append(len(my_numbers))
+    return [card_numbers, winning_stops, winning_numbers, my_stops, my_numbers]
+
+def _load_scratchers(columns):
+    card_numbers, winning_stops, winning_numbers, my_stops, my_numbers = columns
+    scratchers = []
+    winning_start = 0
+    my_start = 0
+    for card_number, winning_stop, my_stop in zip(card_numbers, winning_stops, my_stops):
+        scratchers.append(Scratcher(
+            card_number,
+            get_mask(winning_numbers[winning_start:winning_stop]),
+            get_mask(my_numbers[my_start:my_stop]),
+        ))
+        winning_start = winning_stop
+        my_start = my_stop
+    return scratchers
+
+def get_scratchers(input):
+    return cached_parse(input, "prob4-scratchers", _PARSE_VERSION, _parse_scratchers, _dump_scratchers, _load_scratchers)
+
+class ScratcherColumns:
+    # All the cards' numbers as 2D (card, field) arrays stored row-major, two
+    # bytes per number, instead of a Scratcher per card. Only fixed width
+    # files (two digit numbers, the same count on every card) are read this
+    # way, see get_scratcher_columns_fixed.
+    def __init__(self, num_winning, num_mine):
+        self.num_winning = num_winning
+        self.num_mine = num_mine
+        self.card_numbers = array('L')
+        self.winning_numbers = array('H')
+        self.my_numbers = array('H')
+
+    def get_scratcher(self, idx):
+        return Scratcher(
+            self.card_numbers[idx],
+            get_mask(self.winning_numbers[idx*self.num_winning:(idx+1)*self.num_winning]),
+            get_mask(self.my_numbers[idx*self.num_mine:(idx+1)*self.num_mine]),
+        )
+
+    def get_match_counts(self):
+        return array('B', (self.get_scratcher(idx).num_matches() for idx in range(len(self))))
+
+    def __len__(self):
+        return len(self.card_numbers)
+
+# digit byte --> its value, and its value * 10 for a tens place (blank is 0)
+_UNITS_BYTES = bytes(ch - ord('0') if ord('0') <= ch <= ord('9') else 0 for ch in range(256))
+_TENS_BYTES = bytes(10 * (ch - ord('0')) if ord('0') <= ch <= ord('9') else 0 for ch in range(256))
+
+def _get_fixed_layout(first_line):
+    # Card   1: 58  6 71 93 | 79 33 93 58 53
+    # Numbers are right aligned in two character fields, so each one is found
+    # by where it ends. Returns the colon and pipe offsets and the offset of
+    # each winning and owned field, or None if the line doesn't look like that.
+    colon = first_line.find(b':')
+    pipe = first_line.find(b'|')
+    if not first_line.startswith(b'Card') or colon < 0 or pipe < colon:
+        return None
+    fields = []
+    for section_start, section_end in ((colon + 1, pipe), (pipe + 1, len(first_line.rstrip()))):
+        section_fields = []
+        for number_match in re.finditer(rb'\d+', first_line[section_start:section_end]):
+            field_start = section_start + number_match.end() - 2
+            if len(number_match.group()) > 2 or first_line[field_start - 1:field_start] != b' ':
+                return None
+            section_fields.append(field_start)
+        fields.append(section_fields)
+    return colon, pipe, fields[0], fields[1]
+
+def _get_columns(data, offset, stride, num_cards):
+    return data[offset:offset + stride * num_cards:stride]
+
+def get_scratcher_columns_fixed(data):
+    # Pull every card's numbers straight out of the file by column: field k's
+    # digits of every card are a strided slice, and a translate turns those
+    # into values. Returns None if any card doesn't fit the first line's
+    # layout.
+    first_line_end = data.find(b'\n')
+    first_line = data[:first_line_end] if first_line_end >= 0 else data[:]
+    layout = _get_fixed_layout(first_line)
+    if layout is None:
+        return None
+    colon, pipe, winning_fields, my_fields = layout
+
+    line_len = len(first_line.rstrip(b'\r'))
+    newline = data[line_len:first_line_end + 1] if first_line_end >= 0 else b'\n'
+    stride = line_len + len(newline)
+    # the last line might not have a newline
+    num_cards, remainder = divmod(len(data) + len(newline), stride)
+    if remainder == len(newline) and data[len(data) - len(newline):] == newline:
+        num_newlines = num_cards
+    elif remainder == 0:
+        num_newlines = num_cards - 1
+    else:
+        return None
+    if _get_columns(data, line_len, stride, num_newlines) != newline[:1] * num_newlines:
+        return None
+
+    if _get_columns(data, colon, stride, num_cards) != b':' * num_cards:
+        return None
+    if _get_columns(data, pipe, stride, num_cards) != b'|' * num_cards:
+        return None
+    for offset, ch in enumerate(b'Card'):
+        if _get_columns(data, offset, stride, num_cards) != bytes([ch]) * num_cards:
+            return None
+    for offset in range(4, colon):
+        if _get_columns(data, offset, stride, num_cards).translate(None, b' 0123456789'):
+            return None
+    # Everything after the colon that isn't in a field has to be blank, or a
+    # number spilling out of its field, like the 1 of "104|", would be missed
+    # and the rest of it read as a smaller number.
+    field_offsets = {colon, pipe}
+    for field_start in winning_fields + my_fields:
+        field_offsets.update((field_start, field_start + 1))
+    for offset in range(colon + 1, line_len):
+        if offset not in field_offsets and _get_columns(data, offset, stride, num_cards).translate(None, b' '):
+            return None
+
+    def get_field_values(field_start):
+        tens = _get_columns(data, field_start, stride, num_cards)
+        units = _get_columns(data, field_start + 1, stride, num_cards)
+        if tens.translate(None, b' 0123456789') or units.translate(None, b'0123456789'):
+            return None
+        return bytes(map(add, tens.translate(_TENS_BYTES), units.translate(_UNITS_BYTES)))
+
+    field_values = [get_field_values(field_start) for field_start in winning_fields + my_fields]
+    if None in field_values:
+        return None
+
+    columns = ScratcherColumns(len(winning_fields), len(my_fields))
+    try:
+        columns.card_numbers = array('L', (int(data[idx*stride + 4:idx*stride + colon]) for idx in range(num_cards)))
+    except ValueError:
+        return None
+    # every field's column goes into every num_fields'th byte of its card rows
+    num_winning = len(winning_fields)
+    num_mine = len(my_fields)
+    winning_numbers = bytearray(num_cards * num_winning)
+    my_numbers = bytearray(num_cards * num_mine)
+    for field_idx, values in enumerate(field_values[:num_winning]):
+        winning_numbers[field_idx::num_winning] = values
+    for field_idx, values in enumerate(field_values[num_winning:]):
+        my_numbers[field_idx::num_mine] = values
+    columns.winning_numbers.extend(winning_numbers)
+    columns.my_numbers.extend(my_numbers)
+    return columns
+
+def _parse_scratcher_columns(input):
+    with open(input, 'rb') as f:
+        if os.path.getsize(input) == 0:
+            return ScratcherColumns(0, 0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            columns = get_scratcher_columns_fixed(data)
+    return columns
+
+def _dump_scratcher_columns(columns):
+    shape = array('Q', [columns.num_winning, columns.num_mine])
+    return [shape, columns.card_numbers, columns.winning_numbers, columns.my_numbers]
+
+def _load_scratcher_columns(columns):
+    # the numbers are read only views of the mapped cache file, so no more
+    # cards can be added
+    shape, card_numbers, winning_numbers, my_numbers = columns
+    scratcher_columns = ScratcherColumns(*shape)
+    scratcher_columns.card_numbers = card_numbers
+    scratcher_columns.winning_numbers = winning_numbers
+    scratcher_columns.my_numbers = my_numbers
+    return scratcher_columns
+
+def get_scratcher_columns(input):
+    # None if the cards aren't all laid out like the first one
+    return cached_parse(input, "prob4-columns", _PARSE_VERSION, _parse_scratcher_columns, _dump_scratcher_columns, _load_scratcher_columns)
+
+def get_scratcher_match_counts(input):
+    # by column when the file is fixed width, otherwise card by card
+    columns = get_scratcher_columns(input)
+    if columns is not None:
+        return columns.get_match_counts()
+    _logger.info(f"{input} isn't fixed width, parsing each card")
+    return get_match_counts(input)
 
 def play_scratchers(scratchers):
+    return play_match_counts([scratcher.num_matches() for scratcher in scratchers])
+
+def play_match_counts(match_counts):
     # if we're looking at Card X and N is the number of matching numbers
     # then we get to play copies of Card X+1, ..., Card X+N
 
-    # list of cards we get to play, originally all the "physical" copies
-    total_scratcher_count = len(scratchers)
-    scratcher_stack = list(range(total_scratcher_count))
+    # Every copy of a card wins the same cards, so rather than playing copies
+    # one at a time, carry how many copies of each card there are forward.
+    # Each card adds its count to a window of later cards; a difference array
+    # makes that O(1) per card (add at the start, subtract after the end).
+    # Returns the total played and the number of copies of each card.
+    total_scratcher_count = len(match_counts)
+    copy_diffs = [0] * (total_scratcher_count + 1)
 
-    played_scratcher_count = 0
-    while scratcher_stack:
-        played_scratcher_count += 1
-        current_idx = scratcher_stack.pop()
-        current = scratchers[current_idx]
+    copies = []
+    won_copies = 0
+    for current_idx, num_matches in enumerate(match_counts):
+        won_copies += copy_diffs[current_idx]
+        # the "physical" copy plus any won ones
+        current_copies = 1 + won_copies
+        copies.append(current_copies)
 
-        num_matches = current.num_matches()
         free_start_idx = current_idx + 1
-        free_stop_idx = free_start_idx + num_matches
-        free_idxs = [free_idx for free_idx in range(free_start_idx, free_stop_idx) if free_idx < total_scratcher_count]
-        scratcher_stack.extend(free_idxs)
+        free_stop_idx = min(free_start_idx + num_matches, total_scratcher_count)
+        if free_start_idx < free_stop_idx:
+            copy_diffs[free_start_idx] += current_copies
+            copy_diffs[free_stop_idx] -= current_copies
+
+    return sum(copies), copies
+
+
+def stream_scratchers(lines):
+    # Won copies only ever go to the next few cards (at most the most matches
+    # any card has), so while reading cards in order only the pending copies
+    # for those next cards need to be kept. pending[0] is for the card being
+    # read now. Yields (card number, points so far, cards played so far).
+    pending = deque()
+    point_total = 0
+    played_total = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        scratcher = get_scratcher(line)
+        num_matches = scratcher.num_matches()
 
-    return played_scratcher_count
+        current_copies = 1 + (pending.popleft() if pending else 0)
+        while len(pending) < num_matches:
+            pending.append(0)
+        for free_idx in range(num_matches):
+            pending[free_idx] += current_copies
 
+        point_total += get_points_for_matches(num_matches)
+        played_total += current_copies
+        yield scratcher.card_number, point_total, played_total
+
+def get_scratcher_totals(lines):
+    point_total = 0
+    played_total = 0
+    # running totals at -v, checked once rather than per card
+    log_totals = _logger.isEnabledFor(logging.INFO)
+    for card_number, point_total, played_total in stream_scratchers(lines):
+        if log_totals:
+            _logger.info("Card %s: %s points, %s played", card_number, point_total, played_total)
+    return point_total, played_total
+
+def solve(input):
+    with phase("get_match_counts"):
+        match_counts = get_scratcher_match_counts(input)
+    with phase("get_points"):
+        scratcher_points = [get_points_for_matches(num_matches) for num_matches in match_counts]
+    print(f"Sum of Points: {sum(scratcher_points)}")
+    with phase("play_match_counts"):
+        played_scratcher_count, _ = play_match_counts(match_counts)
+    print(f"Total Scratchcards Played: {played_scratcher_count}")
 
 def main():
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('--input', required=True)
+    parser.add_argument('--input', required=True, help="scratchcards file, or - for stdin (streams)")
+    parser.add_argument('--stream', action='store_true', help="play each card as it's read")
     parser.add_argument('--verbose', '-v', action='count', default=0)
     args = parser.parse_args()
 
@@ -89,11 +412,21 @@ def main():
     }[verbosity]
     log_format = "[%(relativeCreated)6d] %(levelname)-5s %(funcName)s: %(message)s"
     logging.basicConfig(level=logging_level, format=log_format)
+    if logging_level == logging.DEBUG:
+        # -vv also traces every item the solver looks at
+        set_tracing(True)
 
-    scratchers = get_scratchers(args.input)
-    scratcher_points = [scratcher.get_points() for scratcher in scratchers]
-    print(f"Sum of Points: {sum(scratcher_points)}")
-    print(f"Total Scratchcards Played: {play_scratchers(scratchers)}")
+    if args.stream or args.input == "-":
+        if args.input == "-":
+            point_total, played_total = get_scratcher_totals(sys.stdin)
+        else:
+            with open(args.input) as f:
+                point_total, played_total = get_scratcher_totals(f)
+        print(f"Sum of Points: {point_total}")
+        print(f"Total Scratchcards Played: {played_total}")
+        return
+
+    solve(args.input)
 
 
 if __name__ == "__main__":
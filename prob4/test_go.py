@@ -0,0 +1,111 @@
+import pytest
+from parse_cache import set_cache
+from prob4.go import get_match_counts, get_points_for_matches, get_scratcher_match_counts, solve, get_scratcher_columns, get_scratcher_columns_fixed, get_scratcher, get_scratchers, get_scratcher_totals, play_match_counts, play_scratchers, stream_scratchers
+
+SCRATCHERS = [
+    "Card 1: 41 48 83 86 17 | 83 86  6 31 17  9 48 53",
+    "Card 2: 13 32 20 16 61 | 61 30 68 82 17 32 24 19",
+    "Card 3:  1 21 53 59 44 | 69 82 63 72 16 21 14  1",
+    "Card 4: 41 92 73 84 69 | 59 84 76 51 58  5 54 83",
+    "Card 5: 87 83 26 28 32 | 88 30 70 12 93 22 82 36",
+    "Card 6: 31 18 13 56 72 | 74 77 10 23 35 67 36 11",
+]
+
+@pytest.fixture
+def scratchers():
+    return [get_scratcher(line) for line in SCRATCHERS]
+
+def test_points(scratchers):
+    assert [scratcher.get_points() for scratcher in scratchers] == [8, 2, 2, 1, 0, 0]
+
+def test_play_scratchers(scratchers):
+    assert play_scratchers(scratchers) == (30, [1, 2, 4, 8, 14, 1])
+
+def test_play_scratchers_past_end(scratchers):
+    # card 3 wins copies of cards 4 and 5, but there's no card 5
+    assert play_scratchers(scratchers[:4]) == (15, [1, 2, 4, 8])
+
+def test_numbers_round_trip(scratchers):
+    assert scratchers[0].winning_numbers == {41, 48, 83, 86, 17}
+    assert scratchers[0].my_numbers == {83, 86, 6, 31, 17, 9, 48, 53}
+
+def test_numbers_past_mask():
+    # 10**9 would be a 125MB mask
+    scratcher = get_scratcher("Card 1: 41 1000000000 83 | 83 41 6 99")
+    assert isinstance(scratcher.winning_mask, frozenset)
+    assert isinstance(scratcher.my_mask, int)
+    assert scratcher.num_matches() == 2
+    assert get_scratcher("Card 1: 41 1000000000 83 | 83 1000000000 6").num_matches() == 2
+    assert scratcher.winning_numbers == {41, 83, 1000000000}
+
+def test_match_counts(tmp_path, scratchers):
+    input = tmp_path / "scratchers.txt"
+    input.write_text("\n".join(SCRATCHERS))
+    match_counts = get_match_counts(input)
+    assert list(match_counts) == [scratcher.num_matches() for scratcher in scratchers]
+    assert play_match_counts(match_counts) == play_scratchers(scratchers)
+
+def test_stream_scratchers():
+    running_totals = [(points, played) for _, points, played in stream_scratchers(SCRATCHERS)]
+    assert running_totals == [(8, 1), (10, 3), (12, 7), (13, 15), (13, 29), (13, 30)]
+    assert get_scratcher_totals(SCRATCHERS[:4]) == (13, 15)
+
+@pytest.mark.parametrize("newline,trailing", [("\n", False), ("\n", True), ("\r\n", True)])
+def test_scratcher_columns_fixed(tmp_path, scratchers, newline, trailing):
+    input = tmp_path / "scratchers.txt"
+    input.write_bytes((newline.join(SCRATCHERS) + (newline if trailing else "")).encode())
+    columns = get_scratcher_columns(input)
+    assert list(columns.winning_numbers[:5]) == [41, 48, 83, 86, 17]
+    assert [columns.get_scratcher(idx).num_matches() for idx in range(len(columns))] == [scratcher.num_matches() for scratcher in scratchers]
+    assert list(columns.card_numbers) == [1, 2, 3, 4, 5, 6]
+
+def test_scratcher_columns_fallback(tmp_path, scratchers):
+    input = tmp_path / "scratchers.txt"
+    # one card with different spacing breaks the layout
+    input.write_text("\n".join(SCRATCHERS[:2] + ["Card 3: 1 21 53 59 44 | 69 82 63 72 16 21 14 1"] + SCRATCHERS[3:]))
+    assert get_scratcher_columns_fixed(input.read_bytes()) is None
+    assert get_scratcher_columns(input) is None
+    assert list(get_scratcher_match_counts(input)) == [scratcher.num_matches() for scratcher in scratchers]
+
+def solve_output(input):
+    import io
+    from contextlib import redirect_stdout
+    with redirect_stdout(io.StringIO()) as out:
+        solve(input)
+    return out.getvalue().splitlines()
+
+@pytest.mark.parametrize("lines,expected", [
+    # different numbers of numbers on each card
+    (["Card 1: 41 48 83 | 83 86 6 31 17", "Card 2: 13 32 20 16 61 | 61 30 68"], [1, 1]),
+    # too big for two bytes
+    (["Card 1: 41 70000 | 70000 6", "Card 2: 13 5 | 7 5"], [1, 1]),
+    # too many matches for one byte
+    ([f"Card 1: {' '.join(map(str, range(300)))} | {' '.join(map(str, range(300)))}"], [300]),
+])
+def test_uneven_scratchers(tmp_path, lines, expected):
+    input = tmp_path / "scratchers.txt"
+    input.write_text("\n".join(lines))
+    assert list(get_scratcher_match_counts(input)) == expected
+    assert solve_output(input) == [f"Sum of Points: {sum(get_points_for_matches(count) for count in expected)}", f"Total Scratchcards Played: {play_match_counts(expected)[0]}"]
+
+def test_scratcher_columns_spilled_number(tmp_path):
+    # card 2's 104 spills into the blank before the pipe, its 10 alone fits the field
+    lines = ["Card 1: 41 48 83 | 83 86", "Card 2: 41 48104| 83 86"]
+    input = tmp_path / "scratchers.txt"
+    input.write_text("\n".join(lines))
+    assert get_scratcher_columns_fixed(input.read_bytes()) is None
+    with pytest.raises(RuntimeError):
+        get_scratcher_match_counts(input)
+
+def test_parse_cache(tmp_path, scratchers):
+    input = tmp_path / "scratchers.txt"
+    input.write_text("\n".join(SCRATCHERS))
+    set_cache(str(tmp_path / "cache"))
+    try:
+        for _ in range(2):
+            columns = get_scratcher_columns(input)
+            assert (columns.num_winning, columns.num_mine) == (5, 8)
+            assert list(columns.get_match_counts()) == [scratcher.num_matches() for scratcher in scratchers]
+            assert repr(get_scratchers(input)) == repr(scratchers)
+    finally:
+        set_cache(None)
@@ -0,0 +1,49 @@
+import logging
+import random
+import time
+from prob5.go import MAP_LIST, get_almanac
+
+_logger = logging.getLogger(__name__)
+
+def get_location_for_seed_linear(almanac, seed):
+    # what get_location_for_seed did before the maps were compiled
+    src = seed
+    for (type, _) in MAP_LIST:
+        for map in almanac.maps[type]:
+            if map.src.start <= src < map.src.stop:
+                src = map.dest.start + src - map.src.start
+                break
+    return src
+
+def time_lookups(get_location, seeds):
+    start = time.perf_counter()
+    locations = [get_location(seed) for seed in seeds]
+    return locations, time.perf_counter() - start
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', required=True)
+    parser.add_argument('--num-seeds', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    almanac = get_almanac(args.input)
+    rng = random.Random(args.seed)
+    seeds = [rng.randrange(almanac.max_seed) for _ in range(args.num_seeds)]
+
+    linear_locations, linear_elapsed = time_lookups(lambda seed: get_location_for_seed_linear(almanac, seed), seeds)
+    bisect_locations, bisect_elapsed = time_lookups(almanac.get_location_for_seed, seeds)
+    composed_locations, composed_elapsed = time_lookups(almanac.get_seed_to_location().map, seeds)
+    start = time.perf_counter()
+    batch_locations = almanac.get_locations_for_seeds(seeds)
+    batch_elapsed = time.perf_counter() - start
+    assert linear_locations == bisect_locations == composed_locations == list(batch_locations)
+    print(f"  linear: {args.num_seeds / linear_elapsed:,.0f} seeds/s")
+    print(f"  bisect: {args.num_seeds / bisect_elapsed:,.0f} seeds/s")
+    print(f"composed: {args.num_seeds / composed_elapsed:,.0f} seeds/s ({len(almanac.get_seed_to_location())} pieces)")
+    print(f"   batch: {args.num_seeds / batch_elapsed:,.0f} seeds/s")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
 import logging
 import re
 import os
+import sys
+from array import array
+from bisect import bisect_right
 from enum import Enum
-from helpers import range_intersect
+
+if not __package__:
+    # run as a script from inside prob5/, so the top level modules aren't on
+    # the path yet
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrument import get_tracer, phase, set_tracing
+from parse_cache import cached_parse
+from prob5.helpers import IntervalSet
 
 _logger = logging.getLogger(__name__)
+_trace = get_tracer(__name__)
 
 class MapType(Enum):
     SEED_TO_SOIL = 0
@@ -26,6 +37,8 @@ MAP_LIST = [
 ]
 
 class MapInfo:
+    __slots__ = ("src", "dest")
+
     def __init__(self, dest_start, src_start, len):
         self.src = range(src_start, src_start+len)
         self.dest = range(dest_start, dest_start+len)
@@ -33,9 +46,113 @@ class MapInfo:
     def __repr__(self):
         return f"src: {self.src} -> dest: {self.dest}"
 
+class PiecewiseMap:
+    # value --> value + the offset of the piece it's in. Pieces run from their
+    # start to the next one's (the last one forever) and the first starts at
+    # 0, so every non-negative value is in exactly one, found with bisect.
+    __slots__ = ("starts", "offsets")
+
+    def __init__(self, starts, offsets):
+        self.starts = starts
+        self.offsets = offsets
+
+    @classmethod
+    def from_pieces(cls, pieces):
+        # pieces are sorted (start, offset), neighbours with the same offset
+        # are merged
+        starts = []
+        offsets = []
+        for start, offset in pieces:
+            if offsets and offsets[-1] == offset:
+                continue
+            starts.append(start)
+            offsets.append(offset)
+        return cls(starts, offsets)
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        # ranges are non-overlapping (start, stop, offset), anything outside
+        # of them maps to itself
+        pieces = [(0, 0)]
+        for start, stop, offset in sorted(ranges):
+            if pieces[-1][0] == start:
+                pieces.pop()
+            pieces.append((start, offset))
+            pieces.append((stop, 0))
+        return cls.from_pieces(pieces)
+
+    def map_range(self, src_range):
+        # split src_range where it crosses pieces, yielding each part shifted
+        idx = bisect_right(self.starts, src_range.start) - 1
+        start = src_range.start
+        while start < src_range.stop:
+            stop = src_range.stop
+            if idx + 1 < len(self.starts):
+                stop = min(stop, self.starts[idx + 1])
+            offset = self.offsets[idx]
+            yield range(start + offset, stop + offset)
+            start = stop
+            idx += 1
+
+    def map(self, value):
+        return value + self.offsets[bisect_right(self.starts, value) - 1]
+
+    def map_many(self, values):
+        starts = self.starts
+        offsets = self.offsets
+        return array('Q', [value + offsets[bisect_right(starts, value) - 1] for value in values])
+
+    def then(self, other):
+        # The map for other.map(self.map(value)). Each of our pieces shifts
+        # into a contiguous run of other's domain, which other's starts cut
+        # into new pieces with both offsets added.
+        pieces = []
+        for idx, (start, offset) in enumerate(zip(self.starts, self.offsets)):
+            stop = self.starts[idx + 1] if idx + 1 < len(self.starts) else None
+            other_idx = bisect_right(other.starts, start + offset) - 1
+            piece_start = start
+            while True:
+                pieces.append((piece_start, offset + other.offsets[other_idx]))
+                other_idx += 1
+                if other_idx == len(other.starts):
+                    break
+                piece_start = other.starts[other_idx] - offset
+                if stop is not None and piece_start >= stop:
+                    break
+        return PiecewiseMap.from_pieces(pieces)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __repr__(self):
+        return ", ".join(f"[{start}, ...) {offset:+}" for start, offset in zip(self.starts, self.offsets))
+
+class CompiledMap:
+    # A map as piecewise functions both ways round, so a value's range is
+    # found with bisect instead of checking every range.
+    __slots__ = ("forward", "backward")
+
+    def __init__(self, forward, backward):
+        self.forward = forward
+        self.backward = backward
+
+    @classmethod
+    def from_map_list(cls, map_list):
+        return cls(
+            PiecewiseMap.from_ranges((map.src.start, map.src.stop, map.dest.start - map.src.start) for map in map_list),
+            PiecewiseMap.from_ranges((map.dest.start, map.dest.stop, map.src.start - map.dest.start) for map in map_list),
+        )
+
+    def src_to_dest(self, src):
+        return self.forward.map(src)
+
+    def dest_to_src(self, dest):
+        return self.backward.map(dest)
+
 class Almanac:
     def __init__(self):
         self.seeds = []
+        self.seed_set = IntervalSet()
         self.max_seed = 0
         self.maps = {
             MapType.SEED_TO_SOIL: [],
@@ -46,6 +163,10 @@ class Almanac:
             MapType.TEMPERATURE_TO_HUMIDITY: [],
             MapType.HUMIDITY_TO_LOCATION: [],
         }
+        # built from maps on first lookup, dropped when a map changes
+        self.compiled_maps = {}
+        self.seed_to_location = None
+        self.location_to_seed = None
 
     def add_seeds(self, seeds):
         i = 0
@@ -55,90 +176,117 @@ class Almanac:
             self.seeds.append(range(start, stop))
             i += 2
             self.max_seed = max(self.max_seed, stop)
+        self.seed_set = IntervalSet(self.seeds)
 
     def update_map(self, type, map_info):
         self.maps[type].append(map_info)
+        self.compiled_maps.pop(type, None)
+        self.seed_to_location = None
+        self.location_to_seed = None
+
+    def _get_compiled_map(self, type):
+        compiled_map = self.compiled_maps.get(type)
+        if compiled_map is None:
+            compiled_map = self.compiled_maps[type] = CompiledMap.from_map_list(self.maps[type])
+        return compiled_map
+
+    def compile_maps(self):
+        for type in self.maps:
+            self._get_compiled_map(type)
 
     def _map_src_to_dest(self, type, src):
-        map_list = self.maps[type]
-        for map in map_list:
-            if src >= map.src.start:
-                if src < map.src.stop:
-                    offset = src - map.src.start
-                    return map.dest.start + offset
-        return src
+        return self._get_compiled_map(type).src_to_dest(src)
 
     def get_location_for_seed(self, seed):
         src = seed
         for (type,_) in MAP_LIST:
             dest = self._map_src_to_dest(type, src)
             src = dest
-        _logger.debug(f"seed {seed} --> location {dest}")
+        if _trace.enabled:
+            _trace("seed %s --> location %s", seed, dest)
         return dest
 
-    def get_lowest_location_brute(self):
+    def get_seed_to_location(self):
+        # all seven maps composed into one seed --> location map
+        if self.seed_to_location is None:
+            seed_to_location = PiecewiseMap([0], [0])
+            for (type,_) in MAP_LIST:
+                seed_to_location = seed_to_location.then(self._get_compiled_map(type).forward)
+            _logger.debug("seed to location: %s", seed_to_location)
+            self.seed_to_location = seed_to_location
+        return self.seed_to_location
+
+    def get_location_to_seed(self):
+        if self.location_to_seed is None:
+            location_to_seed = PiecewiseMap([0], [0])
+            for (type,_) in reversed(MAP_LIST):
+                location_to_seed = location_to_seed.then(self._get_compiled_map(type).backward)
+            _logger.debug("location to seed: %s", location_to_seed)
+            self.location_to_seed = location_to_seed
+        return self.location_to_seed
+
+    def get_locations_for_seeds(self, seeds):
+        return self.get_seed_to_location().map_many(seeds)
+
+    def get_seeds_for_locations(self, locations):
+        return self.get_location_to_seed().map_many(locations)
+
+    def get_lowest_location_brute(self, chunk_size=1000000):
+        # still every seed, but a chunk at a time through the composed map
         lowest_location = -1
         for seed_range in self.seeds:
-            for seed in seed_range:
-                location = self.get_location_for_seed(seed)
-                lowest_location = min(location, lowest_location) if lowest_location > 0 else location
+            for chunk_start in range(seed_range.start, seed_range.stop, chunk_size):
+                chunk = range(chunk_start, min(chunk_start + chunk_size, seed_range.stop))
+                location = min(self.get_locations_for_seeds(chunk))
+                lowest_location = min(location, lowest_location) if lowest_location >= 0 else location
         return lowest_location
 
     def _map_dest_to_src(self, type, dest):
-        map_list = self.maps[type]
-        for map in map_list:
-            if dest >= map.dest.start:
-                if dest < map.dest.stop:
-                    offset = dest - map.dest.start
-                    return map.src.start + offset
-        return dest
+        return self._get_compiled_map(type).dest_to_src(dest)
 
     def get_seed_for_location(self, location):
         dest = location
         for (type,_) in reversed(MAP_LIST):
             src = self._map_dest_to_src(type, dest)
             dest = src
-        _logger.debug(f"location {location} --> seed {src}")
+        if _trace.enabled:
+            _trace("location %s --> seed %s", location, src)
         return src
 
     def is_seed_valid(self, seed):
-        for seed_range in self.seeds:
-            if seed in seed_range:
-                return True
-        return False
-
-    def get_lowest_location_brute2(self):
-        location = 0
-        while True:
-            seed = self.get_seed_for_location(location)
-            if self.is_seed_valid(seed):
-                return location
-            location += 1
-            if location % 10000 == 0:
-                _logger.info(location)
-
-    def expand_ranges(self, dests):
-        current_start = 0
-        for dest_range in dests:
-            if current_start < dest_range.dest.start:
-                yield MapInfo(current_start, current_start, dest_range.dest.start - current_start)
-            yield dest_range
-            current_start = dest_range.dest.stop
-
-        if current_start < self.max_seed:
-            yield MapInfo(current_start, current_start, self.max_seed - current_start)
+        return seed in self.seed_set
+
+    def get_lowest_location_brute2(self, visited_segments=None):
+        # Still walks up from location 0 checking each location's seed, but
+        # within a piece of the composed location --> seed map the seed is
+        # just location + offset. So each piece either has a valid seed, and
+        # the first one is found with the seed set, or is skipped whole. If
+        # given, visited_segments gets the location range of each piece looked
+        # at.
+        location_to_seed = self.get_location_to_seed()
+        starts = location_to_seed.starts
+        for idx, (location, offset) in enumerate(zip(starts, location_to_seed.offsets)):
+            if idx + 1 < len(starts):
+                stop = starts[idx + 1]
+            else:
+                # past the last piece seeds only get bigger, stop at the last one
+                stop = max(location, self.max_seed - offset)
+            if visited_segments is not None:
+                visited_segments.append(range(location, stop))
+
+            seeds = self.seed_set.intersect_range(range(location + offset, stop + offset))
+            if seeds:
+                _logger.info(f"found lowest location after {idx + 1} segments")
+                return seeds.min() - offset
+        return -1
 
     def get_srcs_for_dests(self, type, dests):
-        maps = list(self.expand_ranges(sorted(self.maps[type], key=lambda map: map.dest.stop)))
-        _logger.debug(f"{type} {maps}")
+        # keeps the order of dests, splitting each one where it crosses the
+        # map's pieces
+        backward = self._get_compiled_map(type).backward
+        _logger.debug("%s %s", type, backward)
         for dest_range in dests:
-            for map in maps:
-                dest_intersect = range_intersect(map.dest, dest_range)
-                if dest_intersect:
-                    offset = dest_intersect.start - map.dest.start
-                    length = dest_intersect.stop - dest_intersect.start
-                    src_intersect = range(map.src.start + offset, map.src.start + offset + length)
-                    yield src_intersect
+            yield from backward.map_range(dest_range)
 
     def get_lowest_location_fast(self):
         location_maps = sorted(self.maps[MapType.HUMIDITY_TO_LOCATION], key=lambda map: map.dest.stop)
@@ -146,20 +294,42 @@ class Almanac:
 
         dest_ranges = [range(0, max_location)]
         for (type,_) in reversed(MAP_LIST):
-            _logger.debug(f"dest_ranges: {dest_ranges}")
+            _logger.debug("dest_ranges: %s", dest_ranges)
             dest_ranges = list(self.get_srcs_for_dests(type, dest_ranges))
 
-        for possible_seed_range in dest_ranges:
-            _logger.debug(f"seed {possible_seed_range.start} --> location {self.get_location_for_seed(possible_seed_range.start)}")
+        if _trace.enabled:
+            for possible_seed_range in dest_ranges:
+                _trace("seed %s --> location %s", possible_seed_range.start, self.get_location_for_seed(possible_seed_range.start))
 
+        # dest_ranges are still in location order, so the first one holding
+        # any seed holds the seed for the lowest location
         for possible_seed_range in dest_ranges:
-            for seed_range in self.seeds:
-                seed_intersect = range_intersect(possible_seed_range, seed_range)
-                if seed_intersect:
-                    lowest_location_seed = seed_intersect.start
-                    lowest_location = self.get_location_for_seed(seed_intersect.start)
-                    _logger.debug(f"found lowest seed: {lowest_location_seed} --> location {lowest_location}")
-                    return lowest_location
+            seed_intersect = self.seed_set.intersect_range(possible_seed_range)
+            if seed_intersect:
+                lowest_location_seed = seed_intersect.min()
+                lowest_location = self.get_location_for_seed(lowest_location_seed)
+                _logger.debug("found lowest seed: %s --> location %s", lowest_location_seed, lowest_location)
+                return lowest_location
+
+    def get_location_ranges(self, fragment_counts=None):
+        # Push the seed ranges forward through each map, splitting them where
+        # they cross a map's pieces and merging whatever ends up touching.
+        # The work only depends on how many ranges there are, not how big.
+        # If given, fragment_counts gets (stage, fragments made, fragments
+        # left after merging) for each map.
+        ranges = self.seed_set
+        for (type, label) in MAP_LIST:
+            forward = self._get_compiled_map(type).forward
+            fragments = [fragment for src_range in ranges for fragment in forward.map_range(src_range)]
+            ranges = IntervalSet(fragments)
+            _logger.info(f"{label}: {len(fragments)} fragments, {len(ranges)} after merging")
+            if fragment_counts is not None:
+                fragment_counts.append((label, len(fragments), len(ranges)))
+        return ranges
+
+    def get_lowest_location_forward(self, fragment_counts=None):
+        location_ranges = self.get_location_ranges(fragment_counts)
+        return location_ranges.min() if location_ranges else -1
 
     def __repr__(self):
         result = f"seeds: {self.seeds}\n"
@@ -169,7 +339,10 @@ class Almanac:
         return result
 
 
-def get_almanac(input):
+# bump when parsing, or how a parsed almanac is cached, changes
+_PARSE_VERSION = 1
+
+def _parse_almanac(input):
     almanac = Almanac()
 
     with open(input) as f:
@@ -207,9 +380,73 @@ def get_almanac(input):
                 )
                 almanac.update_map(type, map_info)
 
-    _logger.debug(f"Almanac: {str(almanac)}")
+    almanac.compile_maps()
+    return almanac
+
+def _dump_almanac(almanac):
+    # the seed pairs as they were read, every map's ranges end to end with
+    # where each map's stop, then each compiled map's pieces both ways round
+    seeds = array('Q')
+    for seed_range in almanac.seeds:
+        seeds.extend([seed_range.start, len(seed_range)])
+    map_stops = array('Q')
+    dest_starts = array('Q')
+    src_starts = array('Q')
+    lengths = array('Q')
+    for (type, _) in MAP_LIST:
+        for map_info in almanac.maps[type]:
+            dest_starts.append(map_info.dest.start)
+            src_starts.append(map_info.src.start)
+            lengths.append(len(map_info.src))
+        map_stops.append(len(lengths))
+    columns = [seeds, map_stops, dest_starts, src_starts, lengths]
+    for (type, _) in MAP_LIST:
+        compiled_map = almanac._get_compiled_map(type)
+        for piecewise_map in (compiled_map.forward, compiled_map.backward):
+            columns.extend([array('Q', piecewise_map.starts), array('q', piecewise_map.offsets)])
+    return columns
+
+def _load_almanac(columns):
+    seeds, map_stops, dest_starts, src_starts, lengths = columns[:5]
+    almanac = Almanac()
+    almanac.add_seeds(seeds)
+    map_start = 0
+    for (type, _), map_stop in zip(MAP_LIST, map_stops):
+        almanac.maps[type] = [MapInfo(dest_starts[idx], src_starts[idx], lengths[idx]) for idx in range(map_start, map_stop)]
+        map_start = map_stop
+    # the compiled maps' pieces stay in the mapped cache file, bisect works
+    # on them just the same
+    compiled_columns = columns[5:]
+    for idx, (type, _) in enumerate(MAP_LIST):
+        forward_starts, forward_offsets, backward_starts, backward_offsets = compiled_columns[4*idx:4*idx + 4]
+        almanac.compiled_maps[type] = CompiledMap(
+            PiecewiseMap(forward_starts, forward_offsets),
+            PiecewiseMap(backward_starts, backward_offsets),
+        )
+    return almanac
+
+def get_almanac(input):
+    almanac = cached_parse(input, "prob5-almanac", _PARSE_VERSION, _parse_almanac, _dump_almanac, _load_almanac)
+    _logger.debug("Almanac: %s", almanac)
     return almanac
 
+def solve(input):
+    with phase("get_almanac"):
+        almanac = get_almanac(input)
+    # print(f"Minimum seed location (brute): {almanac.get_lowest_location_brute()}")
+    visited_segments = []
+    with phase("get_lowest_location_brute2"):
+        lowest_location = almanac.get_lowest_location_brute2(visited_segments)
+    print(f"Minimum seed location (brute2): {lowest_location} ({len(visited_segments)} segments)")
+    with phase("get_lowest_location_fast"):
+        lowest_location = almanac.get_lowest_location_fast()
+    print(f"Minimum seed location (fast): {lowest_location}")
+    fragment_counts = []
+    with phase("get_lowest_location_forward"):
+        lowest_location = almanac.get_lowest_location_forward(fragment_counts)
+    print(f"Minimum seed location (forward): {lowest_location}")
+    print(f"Fragments per stage: {', '.join(f'{label}: {fragments}' for label, fragments, _ in fragment_counts)}")
+
 def main():
     import argparse
 
@@ -228,11 +465,11 @@ def main():
     }[verbosity]
     log_format = "[%(relativeCreated)6d] %(levelname)-5s %(funcName)s: %(message)s"
     logging.basicConfig(level=logging_level, format=log_format)
+    if logging_level == logging.DEBUG:
+        # -vv also traces every item the solver looks at
+        set_tracing(True)
 
-    almanac = get_almanac(args.input)
-    # print(f"Minimum seed location (brute): {almanac.get_lowest_location_brute()}")
-    # print(f"Minimum seed location (brute2): {almanac.get_lowest_location_brute2()}")
-    print(f"Minimum seed location (fast): {almanac.get_lowest_location_fast()}")
+    solve(args.input)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
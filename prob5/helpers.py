@@ -1,3 +1,5 @@
+from bisect import bisect_right
+
 def range_intersect(range_a, range_b):
     if range_a.step != range_b.step:
         raise RuntimeError(f"intersecting ranges must have same step")
@@ -8,3 +10,116 @@ def range_intersect(range_a, range_b):
     return range(int_start, int_stop, range_a.step)
 
 
+class IntervalSet:
+    # A set of integers kept as sorted, non-overlapping, non-touching
+    # [start, stop) intervals in two parallel lists. Set operations walk both
+    # sets' intervals together, so they're linear in the number of intervals;
+    # lookups bisect.
+    __slots__ = ("starts", "stops")
+
+    def __init__(self, ranges=()):
+        self.starts = []
+        self.stops = []
+        for next_range in sorted((r for r in ranges if r), key=lambda r: r.start):
+            if next_range.step != 1:
+                raise RuntimeError(f"interval sets only hold ranges with step 1")
+            self._append(next_range.start, next_range.stop)
+
+    @classmethod
+    def _from_sorted(cls, intervals):
+        # intervals are sorted (start, stop) that may touch but don't overlap
+        interval_set = cls()
+        for start, stop in intervals:
+            if start < stop:
+                interval_set._append(start, stop)
+        return interval_set
+
+    def _append(self, start, stop):
+        if self.stops and start <= self.stops[-1]:
+            self.stops[-1] = max(self.stops[-1], stop)
+        else:
+            self.starts.append(start)
+            self.stops.append(stop)
+
+    def union(self, other):
+        # merge the two already sorted interval lists, taking whichever
+        # starts first, and let _append join anything that overlaps
+        union = IntervalSet()
+        idx = 0
+        other_idx = 0
+        while idx < len(self.starts) or other_idx < len(other.starts):
+            if other_idx == len(other.starts) or (idx < len(self.starts) and self.starts[idx] <= other.starts[other_idx]):
+                union._append(self.starts[idx], self.stops[idx])
+                idx += 1
+            else:
+                union._append(other.starts[other_idx], other.stops[other_idx])
+                other_idx += 1
+        return union
+
+    def intersection(self, other):
+        intervals = []
+        idx = 0
+        other_idx = 0
+        while idx < len(self.starts) and other_idx < len(other.starts):
+            start = max(self.starts[idx], other.starts[other_idx])
+            stop = min(self.stops[idx], other.stops[other_idx])
+            intervals.append((start, stop))
+            # whichever ends first can't overlap anything else
+            if self.stops[idx] < other.stops[other_idx]:
+                idx += 1
+            else:
+                other_idx += 1
+        return IntervalSet._from_sorted(intervals)
+
+    def difference(self, other):
+        intervals = []
+        other_idx = 0
+        for start, stop in zip(self.starts, self.stops):
+            # skip the other intervals that end before this one starts
+            while other_idx < len(other.starts) and other.stops[other_idx] <= start:
+                other_idx += 1
+            cut_idx = other_idx
+            while cut_idx < len(other.starts) and other.starts[cut_idx] < stop:
+                intervals.append((start, other.starts[cut_idx]))
+                start = max(start, other.stops[cut_idx])
+                cut_idx += 1
+            intervals.append((start, stop))
+        return IntervalSet._from_sorted(intervals)
+
+    def intersect_range(self, other_range):
+        # just the intervals overlapping other_range, found with bisect
+        idx = bisect_right(self.stops, other_range.start)
+        intervals = []
+        while idx < len(self.starts) and self.starts[idx] < other_range.stop:
+            intervals.append((max(self.starts[idx], other_range.start), min(self.stops[idx], other_range.stop)))
+            idx += 1
+        return IntervalSet._from_sorted(intervals)
+
+    def shift(self, offset):
+        shifted = IntervalSet()
+        shifted.starts = [start + offset for start in self.starts]
+        shifted.stops = [stop + offset for stop in self.stops]
+        return shifted
+
+    def min(self):
+        if not self.starts:
+            raise ValueError("min of an empty interval set")
+        return self.starts[0]
+
+    def __contains__(self, value):
+        idx = bisect_right(self.starts, value) - 1
+        return idx >= 0 and value < self.stops[idx]
+
+    def __iter__(self):
+        for start, stop in zip(self.starts, self.stops):
+            yield range(start, stop)
+
+    def __len__(self):
+        # number of intervals, not elements
+        return len(self.starts)
+
+    def __eq__(self, other):
+        return isinstance(other, IntervalSet) and self.starts == other.starts and self.stops == other.stops
+
+    def __repr__(self):
+        return f"IntervalSet({list(self)})"
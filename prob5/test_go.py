@@ -0,0 +1,101 @@
+import os
+import pytest
+from parse_cache import set_cache
+from prob5.go import MAP_LIST, Almanac, MapInfo, MapType, PiecewiseMap, get_almanac
+
+@pytest.fixture
+def almanac():
+    return get_almanac(os.path.join(os.path.dirname(__file__), "almanac_simple.txt"))
+
+@pytest.mark.parametrize(
+    "seed,location",
+    [(79, 82),
+     (14, 43),
+     (55, 86),
+     (13, 35),
+])
+def test_location_for_seed(almanac, seed, location):
+    assert almanac.get_location_for_seed(seed) == location
+    assert almanac.get_seed_for_location(location) == seed
+
+def test_composed_maps(almanac):
+    values = list(range(120))
+    assert list(almanac.get_locations_for_seeds(values)) == [almanac.get_location_for_seed(value) for value in values]
+    assert list(almanac.get_seeds_for_locations(values)) == [almanac.get_seed_for_location(value) for value in values]
+
+@pytest.mark.parametrize(
+    "first,second",
+    [([(5, 10, 100)], [(0, 200, 1)]),
+     ([(5, 10, 100)], [(104, 107, -104)]),
+     ([(0, 3, 3), (3, 6, -3)], [(0, 3, 3), (3, 6, -3)]),
+     ([], [(2, 4, 7)]),
+])
+def test_piecewise_then(first, second):
+    first_map = PiecewiseMap.from_ranges(first)
+    second_map = PiecewiseMap.from_ranges(second)
+    composed = first_map.then(second_map)
+    assert [composed.map(value) for value in range(300)] == [second_map.map(first_map.map(value)) for value in range(300)]
+
+def test_lowest_location_forward(almanac):
+    fragment_counts = []
+    assert almanac.get_lowest_location_forward(fragment_counts) == almanac.get_lowest_location_brute() == 46
+    assert [label for label, _, _ in fragment_counts][0] == "seed-to-soil"
+    assert len(fragment_counts) == 7
+
+def test_lowest_location_forward_past_max_seed():
+    # seeds are mapped above max_seed and back down to the lowest location,
+    # which used to be missed by padding gaps only up to max_seed
+    almanac = Almanac()
+    almanac.add_seeds([10, 5])
+    almanac.update_map(MapType.SEED_TO_SOIL, MapInfo(100, 10, 5))
+    almanac.update_map(MapType.HUMIDITY_TO_LOCATION, MapInfo(0, 100, 5))
+    assert almanac.get_lowest_location_forward() == almanac.get_lowest_location_brute() == 0
+    assert almanac.get_lowest_location_fast() == 0
+
+def test_lowest_location_brute2(almanac):
+    visited_segments = []
+    assert almanac.get_lowest_location_brute2(visited_segments) == 46
+    assert visited_segments[0].start == 0
+    assert all(a.stop == b.start for a, b in zip(visited_segments, visited_segments[1:]))
+
+def get_lowest_location_walk(almanac, max_location):
+    # get_lowest_location_brute2 one location at a time
+    for location in range(max_location):
+        if almanac.is_seed_valid(almanac.get_seed_for_location(location)):
+            return location
+    return -1
+
+@pytest.mark.parametrize("partial_maps", [False, True])
+def test_lowest_location_brute2_random(partial_maps):
+    import random
+    rng = random.Random(5)
+    for _ in range(50):
+        almanac = Almanac()
+        almanac.add_seeds([value for _ in range(3) for value in (rng.randrange(200), rng.randrange(1, 20))])
+        for (type, _) in MAP_LIST:
+            # a shuffle of blocks keeps each map's ranges from overlapping
+            blocks = list(range(0, 200, 20))
+            for src_start, dest_start in zip(blocks, rng.sample(blocks, len(blocks))):
+                if not partial_maps or rng.random() < 0.7:
+                    almanac.update_map(type, MapInfo(dest_start, src_start, 20))
+        assert almanac.get_lowest_location_brute2() == get_lowest_location_walk(almanac, 1000)
+        if not partial_maps:
+            # every map is one to one, so walking back from locations agrees
+            # with going forward from seeds
+            assert almanac.get_lowest_location_brute2() == almanac.get_lowest_location_brute() == almanac.get_lowest_location_forward()
+
+def test_parse_cache(tmp_path, almanac):
+    set_cache(str(tmp_path / "cache"))
+    try:
+        input = os.path.join(os.path.dirname(__file__), "almanac_simple.txt")
+        get_almanac(input)
+        cached = get_almanac(input)
+    finally:
+        set_cache(None)
+    assert repr(cached) == repr(almanac)
+    for (type, _) in MAP_LIST:
+        assert repr(cached.compiled_maps[type].forward) == repr(almanac.compiled_maps[type].forward)
+        assert repr(cached.compiled_maps[type].backward) == repr(almanac.compiled_maps[type].backward)
+    assert cached.get_lowest_location_fast() == almanac.get_lowest_location_fast()
+    assert cached.get_lowest_location_brute2() == almanac.get_lowest_location_brute2()
+    assert cached.get_lowest_location_forward() == almanac.get_lowest_location_forward()
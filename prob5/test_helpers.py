@@ -1,5 +1,5 @@
 import pytest
-from prob5.helpers import range_intersect
+from prob5.helpers import IntervalSet, range_intersect
 
 @pytest.mark.parametrize(
     "a,b,expected",
@@ -11,4 +11,52 @@ from prob5.helpers import range_intersect
      (range(12,14), range(10,15), range(12,14)),
 ])
 def test_range_intersect(a, b, expected):
-    assert range_intersect(a, b) == expected
\ No newline at end of file
+    assert range_intersect(a, b) == expected
+
+def as_set(interval_set):
+    return {value for interval in interval_set for value in interval}
+
+INTERVALS = [
+    [],
+    [range(0, 5)],
+    [range(3, 8), range(0, 4)],
+    [range(0, 2), range(2, 4), range(10, 12)],
+    [range(5, 5), range(6, 9), range(20, 30), range(11, 14)],
+    [range(1, 2), range(4, 7), range(12, 25)],
+]
+
+@pytest.mark.parametrize(
+    "ranges,expected",
+    [([], []),
+     ([range(0, 0)], []),
+     ([range(3, 8), range(0, 4)], [range(0, 8)]),
+     ([range(0, 2), range(2, 4)], [range(0, 4)]),
+     ([range(10, 12), range(0, 2), range(4, 5)], [range(0, 2), range(4, 5), range(10, 12)]),
+])
+def test_interval_set_coalesces(ranges, expected):
+    assert list(IntervalSet(ranges)) == expected
+
+@pytest.mark.parametrize("a", INTERVALS)
+@pytest.mark.parametrize("b", INTERVALS)
+def test_interval_set_ops(a, b):
+    set_a = IntervalSet(a)
+    set_b = IntervalSet(b)
+    assert as_set(set_a.union(set_b)) == as_set(set_a) | as_set(set_b)
+    assert as_set(set_a.intersection(set_b)) == as_set(set_a) & as_set(set_b)
+    assert as_set(set_a.difference(set_b)) == as_set(set_a) - as_set(set_b)
+    # results stay coalesced
+    assert set_a.union(set_b) == IntervalSet(set_a.union(set_b))
+    assert set_a.difference(set_b) == IntervalSet(set_a.difference(set_b))
+
+@pytest.mark.parametrize("a", INTERVALS)
+def test_interval_set_lookups(a):
+    interval_set = IntervalSet(a)
+    for value in range(-2, 32):
+        assert (value in interval_set) == (value in as_set(interval_set))
+    assert as_set(interval_set.shift(100)) == {value + 100 for value in as_set(interval_set)}
+    assert as_set(interval_set.intersect_range(range(3, 13))) == as_set(interval_set) & set(range(3, 13))
+    if interval_set:
+        assert interval_set.min() == min(as_set(interval_set))
+    else:
+        with pytest.raises(ValueError):
+            interval_set.min()
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+import pytest
+from advent import parse_inputs, parse_problems
+
+@pytest.mark.parametrize(
+    "raw_problems,expected",
+    [(["1"], [1]),
+     (["1..5"], [1, 2, 3, 4, 5]),
+     (["2..3", "5"], [2, 3, 5]),
+     (["all"], [1, 2, 3, 4, 5]),
+])
+def test_parse_problems(raw_problems, expected):
+    assert parse_problems(raw_problems) == expected
+
+def test_parse_problems_unknown():
+    with pytest.raises(RuntimeError):
+        parse_problems(["6"])
+
+def test_parse_inputs():
+    assert parse_inputs(["x.txt"], [2]) == {2: "x.txt"}
+    assert parse_inputs(["2=x.txt", "5=y.txt"], [2, 5]) == {2: "x.txt", 5: "y.txt"}
+    with pytest.raises(RuntimeError):
+        parse_inputs(["x.txt"], [2, 5])
+
+def test_solvers_imported_lazily():
+    # a fresh interpreter, since this one has imported the solvers for tests
+    code = "import sys, advent; print(any(name.startswith('prob') for name in sys.modules))"
+    assert subprocess.check_output([sys.executable, "-c", code], text=True).strip() == "False"
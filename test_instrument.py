@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+import pytest
+from instrument import Profile, Tracer, phase
+from advent import main
+
+def test_phase_without_profile():
+    with phase("nothing"):
+        pass
+
+def test_profile_phases():
+    with Profile("test") as profile:
+        with phase("first"):
+            pass
+        with phase("second"):
+            list(range(1000))
+    assert [p["name"] for p in profile.phases] == ["first", "second"]
+    assert all(p["peak_memory"] is None for p in profile.phases)
+    assert profile.seconds >= sum(p["seconds"] for p in profile.phases)
+    # done recording
+    with phase("third"):
+        pass
+    assert len(profile.phases) == 2
+
+def test_profile_memory():
+    with Profile("test", trace_memory=True) as profile:
+        with phase("alloc"):
+            data = [0] * 100000
+        del data
+    assert profile.phases[0]["peak_memory"] >= 100000 * 8
+    assert profile.peak_memory >= profile.phases[0]["peak_memory"]
+
+def test_profile_nested():
+    with Profile("outer"):
+        with pytest.raises(RuntimeError):
+            with Profile("inner"):
+                pass
+
+def test_advent_profile(tmp_path):
+    report_path = tmp_path / "report.json"
+    main(["run", "2", "4", "--profile", str(report_path), "--cprofile", str(tmp_path / "prof")])
+    with open(report_path) as f:
+        reports = json.load(f)["problems"]
+    assert [report["label"] for report in reports] == ["prob2", "prob4"]
+    assert [p["name"] for p in reports[0]["phases"]] == ["get_game_table", "get_possible_games", "get_game_powers"]
+    assert os.path.exists(tmp_path / "prof" / "prob4.prof")
+
+def test_tracer_disabled(caplog):
+    trace = Tracer("test.disabled")
+    assert not trace.enabled
+    caplog.set_level(logging.DEBUG)
+    if trace.enabled:
+        trace("never %s", "emitted")
+    assert not caplog.records
+
+def test_tracer_sampled(caplog):
+    trace = Tracer("test.sampled", enabled=True, sample_every=3)
+    caplog.set_level(logging.DEBUG)
+    for idx in range(7):
+        trace("event %s", idx)
+    assert [record.getMessage() for record in caplog.records] == ["event 0", "event 3", "event 6"]
+
+def test_advent_trace(caplog):
+    from instrument import set_tracing
+    try:
+        main(["run", "1", "--trace-sample", "100"])
+    finally:
+        set_tracing(False)
+    # one trace event per line of the 1000 line input, the first of every 100 emitted
+    records = [record for record in caplog.records if record.name == "prob1.go.trace"]
+    assert len(records) == 10
+    assert all(record.getMessage().startswith("cal value for ") for record in records)
+    assert {record.funcName for record in records} == {"get_cal_value_automaton"}
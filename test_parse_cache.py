@@ -0,0 +1,68 @@
+import os
+from array import array
+import pytest
+import parse_cache
+from parse_cache import ParseCache, cached_parse, read_columns, set_cache, write_columns
+
+@pytest.fixture
+def cache(tmp_path):
+    set_cache(str(tmp_path / "cache"))
+    yield parse_cache._cache
+    set_cache(None)
+
+def test_columns_round_trip(tmp_path):
+    columns = [array('B', b"abc"), array('Q', [1, 2, 1 << 63]), array('q', [-5, 5]), array('H'), array('I', [7])]
+    path = tmp_path / "columns.bin"
+    with open(path, 'wb') as f:
+        write_columns(f, columns)
+    loaded = read_columns(path.read_bytes())
+    assert [list(column) for column in loaded] == [list(column) for column in columns]
+
+@pytest.mark.parametrize("data", [b"", b"not a cache file at all", b"ADVCACHE\x05"])
+def test_read_columns_corrupt(data):
+    assert read_columns(data) is None
+
+def test_read_columns_truncated(tmp_path):
+    path = tmp_path / "columns.bin"
+    with open(path, 'wb') as f:
+        write_columns(f, [array('Q', range(100))])
+    assert read_columns(path.read_bytes()[:-8]) is None
+
+def test_cached_parse(tmp_path, cache):
+    input = tmp_path / "input.txt"
+    input.write_text("1 2 3")
+    parses = []
+    def parse(input):
+        parses.append(input)
+        with open(input) as f:
+            return [int(number) for number in f.read().split()]
+    def get_numbers():
+        return list(cached_parse(str(input), "numbers", 1, parse, lambda numbers: [array('Q', numbers)], lambda columns: columns[0]))
+
+    assert get_numbers() == [1, 2, 3]
+    assert get_numbers() == [1, 2, 3]
+    assert len(parses) == 1
+    # new contents, new entry
+    input.write_text("4 5")
+    assert get_numbers() == [4, 5]
+    assert len(parses) == 2
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ParseCache(str(tmp_path), max_bytes=2500)
+    paths = []
+    for idx in range(3):
+        paths.append(os.path.join(tmp_path, f"entry-{idx}.bin"))
+        cache.store(paths[-1], [array('B', bytes(1000))])
+        # mtimes a second apart so the order doesn't depend on timer resolution
+        os.utime(paths[-1], (idx, idx))
+        if idx == 1:
+            # using the first entry makes the second the least recently used
+            assert cache.load(paths[0]) is not None
+            os.utime(paths[0], (2, 2))
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+
+def test_too_big_to_cache(tmp_path):
+    cache = ParseCache(str(tmp_path), max_bytes=100)
+    path = os.path.join(tmp_path, "entry.bin")
+    cache.store(path, [array('B', bytes(1000))])
+    assert not os.path.exists(path)